@@ -0,0 +1,74 @@
+"""Benchmark recall and query time of the IVF index against the exact scan of the embedding store.
+
+Usage: python benchmarks/bench_ann_index.py [n_rows] [dim]
+
+Embeddings are synthetic: papers are drawn between topic centres, benchmarks are noisy copies of
+random papers, like interest profiles built from papers the user liked.
+"""
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+import oai_fixture  # noqa: F401, puts src on sys.path
+from models.embed_store import EmbeddingStore
+from models.ann_index import IVFIndex
+from models.similarity import normalize_embeddings
+
+
+def synthetic_embeddings(n_rows, dim, n_topics=500, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    # papers mix two topics, so clusters overlap like those of real abstracts
+    first, second = rng.integers(0, n_topics, n_rows), rng.integers(0, n_topics, n_rows)
+    weight = rng.random((n_rows, 1), dtype=np.float32)
+    vectors = weight * centres[first] + (1 - weight) * centres[second]
+    return vectors + 0.5 * rng.standard_normal((n_rows, dim)).astype(np.float32)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    n_queries, k = 50, 10
+
+    vectors = synthetic_embeddings(n_rows, dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n_rows, n_queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as store_path:
+        store = EmbeddingStore(store_path, 'bench-model')
+        store.append([f"paper-{i}" for i in range(n_rows)], vectors)
+        del vectors
+
+        n_lists = int(np.sqrt(n_rows))
+        index = IVFIndex(store, n_lists=n_lists)
+        start = time.perf_counter()
+        index.sync()
+        print(f"{n_rows} x {dim} embeddings, {n_lists} lists, built in {time.perf_counter() - start:.2f}s")
+
+        # exact top-k, block-wise over the memmap like filter_stored_by_topics
+        start = time.perf_counter()
+        normalized = normalize_embeddings(queries)
+        exact = []
+        for _, block in store.iter_blocks():
+            exact.append(normalize_embeddings(block) @ normalized.T)
+        exact = np.argsort(-np.vstack(exact), axis=0)[:k].T
+        exact_time = time.perf_counter() - start
+        print(f"exact        : {exact_time * 1000 / n_queries:8.2f} ms/query, recall@{k} 1.000")
+
+        for n_probe in (1, 4, 8, 16, 32, 64):
+            index.n_probe = n_probe
+            start = time.perf_counter()
+            results = index.search(queries, k=k)
+            elapsed = time.perf_counter() - start
+            recall = np.mean([len(set(row for row, _ in found) & set(truth)) / k
+                              for found, truth in zip(results, exact)])
+            print(f"ivf n_probe {n_probe:2d}: {elapsed * 1000 / n_queries:8.2f} ms/query, recall@{k} {recall:.3f}, "
+                  f"{exact_time / elapsed:5.1f}x faster")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark keyword search over stored OAI papers: FTS5 index with BM25 ranking vs. loading the table into pandas
+and scanning it, and the cost of keeping the index in sync while writing.
+
+Usage: python benchmarks/bench_fts_search.py [harvest.xml]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+import oai_fixture
+from tools.oai_decoder import decode_oai_file
+from database.paper_records import OAIPaper, records_to_frame
+from database.sqlite_store import SQLiteStore
+from database.sqlite_interface import df_to_sqlite, search_papers
+
+# synthetic text draws on a small vocabulary, so each paper also gets one of N_TOPICS rare terms;
+# the last query is broad and matches nearly every paper, the worst case of BM25 ranking
+N_TOPICS = 5000
+QUERIES = ["topic42", "topic1234 topic777", "topic99 graph", "graph neural network"]
+FTS_COLUMNS = ['title', 'abstract', 'authors']
+
+
+def pandas_search(db_name, query):
+    """search before the index: load the table and match any term in title, abstract or authors"""
+    with sqlite3.connect(db_name) as conn:
+        df = pd.read_sql_query("SELECT * FROM oai_paper_pool", conn)
+    text = (df['title'].fillna('') + ' ' + df['abstract'].fillna('') + ' ' + df['authors'].fillna('')).str.lower()
+    mask = pd.Series(False, index=df.index)
+    for term in query.lower().split():
+        mask |= text.str.contains(rf"\b{term}\b")
+    return df[mask]
+
+
+def main():
+    path = oai_fixture.fixture_path(sys.argv, n_records=100000)
+    records = [OAIPaper.from_dict(x) for x in decode_oai_file(path, n_workers=1)]
+    df = records_to_frame(records, OAIPaper)
+    df['abstract'] = df['abstract'] + [f" topic{i % N_TOPICS}" for i in range(len(df))]
+    df['insert_dt'] = '2025-01-02'
+    n = len(df)
+    print(f"{n} rows from {path}")
+
+    with tempfile.TemporaryDirectory() as db_path:
+        for name, fts_columns in (("write without index", None), ("write with index", FTS_COLUMNS)):
+            db_name = os.path.join(db_path, f"{name.replace(' ', '_')}.db")
+            start = time.perf_counter()
+            df_to_sqlite(df, 'oai_paper_pool', db_name, id_key='identifier', fts_columns=fts_columns)
+            print(f"{name:22s}: {time.perf_counter() - start:7.2f}s for {n} rows")
+
+        with SQLiteStore(db_name) as store:
+            for query in QUERIES:
+                start = time.perf_counter()
+                scanned = pandas_search(db_name, query)
+                scan_time = time.perf_counter() - start
+                start = time.perf_counter()
+                found = search_papers(store, 'oai_paper_pool', query, limit=50, columns=['identifier', 'title'],
+                                     match_all=False)
+                search_time = time.perf_counter() - start
+                print(f"'{query}': pandas scan {scan_time * 1000:8.1f}ms ({len(scanned)} matches), "
+                      f"FTS5 top-50 {search_time * 1000:6.1f}ms ({len(found)} returned)")
+
+
+if __name__ == '__main__':
+    main()
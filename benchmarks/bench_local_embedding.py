@@ -0,0 +1,68 @@
+"""Benchmark the local embedding backend against a stand-in Ollama server: one text per request
+(the former ollama_embedding loop) vs. concurrent batches.
+
+Usage: python benchmarks/bench_local_embedding.py [n_texts]
+
+The stand-in serves `/api/embed` with a fixed latency per request plus a latency per text,
+like a local model that batches inputs on one GPU.
+"""
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import oai_fixture  # noqa: F401, puts src on sys.path
+from models.local_embedding import local_embedding_async
+
+REQUEST_LATENCY = 0.02  # seconds per request
+TEXT_LATENCY = 0.001  # seconds per text in a request
+DIM = 1024
+
+
+class StandInEmbedHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+        time.sleep(REQUEST_LATENCY + TEXT_LATENCY * len(texts))
+        embeddings = [[(len(text) + i) % 7 / 7 for i in range(DIM)] for text in texts]
+        payload = json.dumps({"model": body['model'], "embeddings": embeddings}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    n_texts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    texts = [f"abstract {i} " * (i % 50 + 1) for i in range(n_texts)]
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInEmbedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{n_texts} texts, stand-in server at {base_url}")
+
+    results = {}
+    for name, batch_size, n_concurrent in (("one text per request", 1, 1),
+                                           ("batches of 32, 1 in flight", 32, 1),
+                                           ("batches of 32, 4 in flight", 32, 4)):
+        start = time.perf_counter()
+        results[name] = asyncio.run(local_embedding_async(
+            None, 'stand-in', texts, n_concurrent=n_concurrent, batch_size=batch_size, base_url=base_url))
+        elapsed = time.perf_counter() - start
+        print(f"{name:28s}: {elapsed:6.2f}s, {n_texts / elapsed:8.1f} texts/s")
+
+    embeddings = list(results.values())
+    assert all(x.dtype == np.float32 and x.flags['C_CONTIGUOUS'] and np.array_equal(x, embeddings[0]) for x in embeddings)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
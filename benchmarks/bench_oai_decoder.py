@@ -0,0 +1,38 @@
+"""Benchmark decode_oai_record against the find()-based parse_oai_record.
+
+Usage: python benchmarks/bench_oai_decoder.py [harvest.xml]
+"""
+import sys
+import time
+
+from oai_fixture import fixture_path
+from tools.oai_decoder import parse_oai_record, decode_oai_record
+
+
+def bench(parser, lines, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parser(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    path = fixture_path(sys.argv)
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    mismatches = sum(parse_oai_record(line) != decode_oai_record(line) for line in lines)
+    print(f"{len(lines)} records from {path}, {mismatches} mismatched records")
+
+    t_ref = bench(parse_oai_record, lines)
+    t_new = bench(decode_oai_record, lines)
+    print(f"parse_oai_record : {t_ref:.3f}s  ({len(lines) / t_ref:,.0f} records/s)")
+    print(f"decode_oai_record: {t_new:.3f}s  ({len(lines) / t_new:,.0f} records/s)")
+    print(f"speedup: {t_ref / t_new:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
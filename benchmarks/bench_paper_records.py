@@ -0,0 +1,58 @@
+"""Benchmark memory per paper of OAIPaper records against plain dicts.
+
+Usage: python benchmarks/bench_paper_records.py [harvest.xml]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from oai_fixture import fixture_path
+from tools.oai_decoder import decode_oai_file
+from database.paper_records import OAIPaper, records_to_frame, records_from_frame
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    path = fixture_path(sys.argv)
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    # decode from raw lines inside each measurement, so strings are not shared between the two
+    dicts, dict_size, _ = measure(lambda: decode_oai_file(path, n_workers=1))
+    n = len(dicts)
+    sample = dicts[:]
+    del dicts
+    records, record_size, _ = measure(lambda: [OAIPaper.from_dict(x) for x in decode_oai_file(path, n_workers=1)])
+    print(f"{n} records from {path}")
+    print(f"dict    : {dict_size / n:,.0f} bytes/paper")
+    print(f"OAIPaper: {record_size / n:,.0f} bytes/paper ({dict_size / record_size:.2f}x smaller)")
+
+    # payload strings (title, abstract, ...) are the same in both, compare the containers alone
+    dict_overhead = sum(sys.getsizeof(x) + sys.getsizeof(x['authors']) + sys.getsizeof(x['categories']) for x in sample) / n
+    record_overhead = sum(sys.getsizeof(x) + sys.getsizeof(x.authors) + sys.getsizeof(x.categories) for x in records) / n
+    print(f"container overhead: dict {dict_overhead:,.0f} vs OAIPaper {record_overhead:,.0f} bytes/paper "
+          f"({dict_overhead / record_overhead:.2f}x smaller)")
+
+    start = time.perf_counter()
+    df = records_to_frame(records, OAIPaper)
+    t_to = time.perf_counter() - start
+    start = time.perf_counter()
+    records_back = records_from_frame(df, OAIPaper)
+    t_from = time.perf_counter() - start
+    assert records_back == records
+    print(f"to DataFrame: {t_to:.2f}s, from DataFrame: {t_from:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
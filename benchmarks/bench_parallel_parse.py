@@ -0,0 +1,32 @@
+"""Benchmark process-pool parsing of a harvest file against single-core parsing.
+
+Usage: python benchmarks/bench_parallel_parse.py [harvest.xml]
+"""
+import os
+import sys
+import time
+
+from oai_fixture import fixture_path
+from tools.oai_decoder import decode_oai_file
+
+
+def main():
+    path = fixture_path(sys.argv, n_records=100000)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+
+    start = time.perf_counter()
+    sequential = decode_oai_file(path, n_workers=1)
+    t_seq = time.perf_counter() - start
+    print(f"{len(sequential)} records ({size_mb:.0f} MB) from {path}")
+    print(f"1 worker : {t_seq:.2f}s  ({size_mb / t_seq:.1f} MB/s)")
+
+    for n_workers in sorted({2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        parallel = decode_oai_file(path, n_workers=n_workers, min_shard_bytes=1024 * 1024)
+        t_par = time.perf_counter() - start
+        assert parallel == sequential, "parallel decode changed records or their order"
+        print(f"{n_workers} workers: {t_par:.2f}s  ({size_mb / t_par:.1f} MB/s, {t_seq / t_par:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark memory, speed and ranking fidelity of int8-quantized candidate embeddings against the float path.
+
+Usage: python benchmarks/bench_quantization.py [n_candidates] [dim]
+
+Embeddings are synthetic, with overlapping topics; benchmarks are noisy copies of random candidates.
+"""
+import sys
+import time
+
+import numpy as np
+
+import oai_fixture  # noqa: F401, puts src on sys.path
+from filter_and_ranking import select_top_matches, select_top_matches_int8
+from models.similarity import cosine_similarity_blocks, int8_similarity_blocks, quantize_int8
+
+
+def synthetic_embeddings(n_rows, dim, n_topics=500, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    first, second = rng.integers(0, n_topics, n_rows), rng.integers(0, n_topics, n_rows)
+    weight = rng.random((n_rows, 1), dtype=np.float32)
+    vectors = weight * centres[first] + (1 - weight) * centres[second]
+    return vectors + 0.5 * rng.standard_normal((n_rows, dim)).astype(np.float32)
+
+
+def ranking(match_results):
+    return [x["candidate_index"] for x in match_results]
+
+
+def main():
+    n_candidates = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    n_benchmarks, top_k = 100, 50
+
+    candidates = synthetic_embeddings(n_candidates, dim)
+    rng = np.random.default_rng(1)
+    benchmarks = candidates[rng.choice(n_candidates, n_benchmarks, replace=False)]
+    benchmarks = benchmarks + 0.5 * rng.standard_normal(benchmarks.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    codes, scales = quantize_int8(candidates)
+    quantize_time = time.perf_counter() - start
+    print(f"{n_benchmarks} benchmarks x {n_candidates} candidates, dim {dim}, top_k {top_k}")
+    print(f"memory: float64 {n_candidates * dim * 8 / 2 ** 20:,.0f} MB, float32 {candidates.nbytes / 2 ** 20:,.0f} MB, "
+          f"int8 {(codes.nbytes + scales.nbytes) / 2 ** 20:,.0f} MB (quantized in {quantize_time:.2f}s)")
+
+    # pick a threshold that a few hundred candidates pass, like the daily pool against a profile
+    best = np.concatenate([block.max(axis=0) for _, block in cosine_similarity_blocks(benchmarks, candidates)])
+    threshold = float(np.sort(best)[-300])
+
+    start = time.perf_counter()
+    exact = select_top_matches(cosine_similarity_blocks(benchmarks, candidates), threshold, top_k)
+    print(f"float32             : {time.perf_counter() - start:6.3f}s")
+
+    start = time.perf_counter()
+    approx = select_top_matches(int8_similarity_blocks(benchmarks, codes, scales), threshold, top_k)
+    int8_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rescored = select_top_matches_int8(benchmarks, codes, scales, candidates, threshold, top_k)
+    rescored_time = time.perf_counter() - start
+
+    exact_ranking = ranking(exact)
+    exact_scores = {x["candidate_index"]: x["matched_info"][0]["similarity"] for x in exact}
+    for name, results, elapsed in (("int8                ", approx, int8_time),
+                                   ("int8 + float rescore", rescored, rescored_time)):
+        result_ranking = ranking(results)
+        overlap = len(set(result_ranking) & set(exact_ranking)) / max(len(exact_ranking), 1)
+        same_order = result_ranking == exact_ranking
+        score_error = max((abs(x["matched_info"][0]["similarity"] - exact_scores[x["candidate_index"]])
+                           for x in results if x["candidate_index"] in exact_scores), default=0)
+        print(f"{name}: {elapsed:6.3f}s, top-{top_k} overlap {overlap:.3f}, identical ranking {same_order}, "
+              f"max score error {score_error:.1e}")
+
+
+if __name__ == '__main__':
+    main()
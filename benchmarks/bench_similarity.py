@@ -0,0 +1,82 @@
+"""Benchmark import time, resident memory and speed of the NumPy cosine similarity against
+sentence-transformers' pytorch_cos_sim it replaces.
+
+Usage: python benchmarks/bench_similarity.py [n_candidates] [dim]
+
+Each import is measured in a fresh interpreter; the torch side is skipped if sentence-transformers
+is not installed.
+"""
+import os
+import sys
+import time
+import subprocess
+
+import numpy as np
+
+import oai_fixture  # noqa: F401, puts src on sys.path
+from models.similarity import cosine_similarity_matrix, normalize_embeddings
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+_PROBE = """
+import sys, time, resource
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def measure_import(statement):
+    """(seconds to import, peak RSS in MB) of statement in a fresh interpreter, None if it fails"""
+    result = subprocess.run([sys.executable, '-c', _PROBE.format(src=SRC_PATH, statement=statement)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    elapsed, max_rss = result.stdout.split()
+    return float(elapsed), int(max_rss) / 1024  # ru_maxrss is in KB on Linux
+
+
+def main():
+    n_candidates = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    n_benchmarks = 200
+
+    baseline = measure_import("pass")
+    print(f"{'python alone':28s}: {baseline[0]:6.2f}s, {baseline[1]:7.1f} MB peak RSS")
+    for name, statement in (("sentence_transformers.util", "from sentence_transformers import util"),
+                            ("models.similarity", "from models.similarity import cosine_similarity_matrix")):
+        result = measure_import(statement)
+        if result is None:
+            print(f"{name:28s}: not installed")
+        else:
+            print(f"{name:28s}: {result[0]:6.2f}s, {result[1]:7.1f} MB peak RSS")
+
+    rng = np.random.default_rng(0)
+    benchmarks = rng.standard_normal((n_benchmarks, dim)).astype(np.float32)
+    candidates = rng.standard_normal((n_candidates, dim)).astype(np.float32)
+    print(f"\n{n_benchmarks} benchmarks x {n_candidates} candidates, dim {dim}")
+
+    start = time.perf_counter()
+    exact = cosine_similarity_matrix(benchmarks, candidates)
+    print(f"numpy float32        : {time.perf_counter() - start:6.3f}s")
+
+    stored = normalize_embeddings(candidates, dtype=np.float16)
+    start = time.perf_counter()
+    half = cosine_similarity_matrix(normalize_embeddings(benchmarks), stored, normalized=True)
+    print(f"numpy float16 storage: {time.perf_counter() - start:6.3f}s, "
+          f"{candidates.nbytes / 2 ** 20:.0f} -> {stored.nbytes / 2 ** 20:.0f} MB, "
+          f"max abs error {np.abs(half - exact).max():.1e}")
+
+    try:
+        from sentence_transformers import util
+    except ImportError:
+        return
+    start = time.perf_counter()
+    util.pytorch_cos_sim(benchmarks, candidates).numpy()
+    print(f"pytorch_cos_sim      : {time.perf_counter() - start:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark writing OAI papers to SQLite: object-column serialization of df_to_sqlite before and after
+the single-pass rewrite, and the whole write.
+
+Usage: python benchmarks/bench_sqlite_write.py [harvest.xml]
+
+The former per-row serialization is quadratic, so it is timed on a slice and extrapolated.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+import oai_fixture
+from tools.oai_decoder import decode_oai_file
+from database.paper_records import OAIPaper, records_to_frame
+from database.sqlite_interface import df_to_sqlite, serialize_object_columns, orjson
+import database.sqlite_interface as sqlite_interface
+
+LEGACY_ROWS = 1000
+
+
+def legacy_serialize(df):
+    """object-column conversion of df_to_sqlite before the rewrite"""
+    df_converted = df.copy()
+    for col in df_converted.columns:
+        if df_converted[col].dtype == 'object':
+            df_converted[col] = df_converted[col].apply(lambda x: json.dumps(x, ensure_ascii=False) if any(isinstance(x, (dict, list)) for x in df_converted[col].dropna()) else str(x))
+    return df_converted
+
+
+def main():
+    path = oai_fixture.fixture_path(sys.argv, n_records=100000)
+    records = [OAIPaper.from_dict(x) for x in decode_oai_file(path, n_workers=1)]
+    df = records_to_frame(records, OAIPaper)
+    df['extra_info'] = [{"source": "oai", "rank": i} for i in range(len(df))]
+    df['insert_dt'] = '2025-01-02'
+    n = len(df)
+    print(f"{n} rows from {path}")
+
+    sample = df.iloc[:LEGACY_ROWS].astype(object)
+    start = time.perf_counter()
+    legacy_serialize(sample)
+    legacy_time = time.perf_counter() - start
+    print(f"legacy serialization  : {legacy_time:7.2f}s for {LEGACY_ROWS} rows, "
+          f"~{legacy_time * (n / LEGACY_ROWS) ** 2:,.0f}s extrapolated to {n} rows")
+
+    encoder = sqlite_interface.orjson
+    for name, fast_encoder in (("json", None), ("orjson", orjson)):
+        if name == "orjson" and orjson is None:
+            print("orjson serialization  : not installed")
+            continue
+        sqlite_interface.orjson = fast_encoder
+        start = time.perf_counter()
+        serialize_object_columns(df)
+        print(f"{name + ' serialization':22s}: {time.perf_counter() - start:7.2f}s for {n} rows")
+    sqlite_interface.orjson = encoder
+
+    with tempfile.TemporaryDirectory() as db_path:
+        start = time.perf_counter()
+        df_to_sqlite(df, 'oai_paper_pool', os.path.join(db_path, 'bench.db'), id_key='identifier')
+        print(f"df_to_sqlite          : {time.perf_counter() - start:7.2f}s for {n} rows")
+
+
+if __name__ == '__main__':
+    main()
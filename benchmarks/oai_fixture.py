@@ -0,0 +1,68 @@
+"""Generate an OAI harvest file (one arXiv record per line) for benchmarks.
+
+Pass a real harvest file (e.g. `../data/cs_2025-01-01_2025-01-02.xml`) to the benchmarks
+to measure on recorded data instead.
+"""
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+_WORDS = ("language model retrieval graph neural network diffusion agent reasoning benchmark "
+          "transformer attention robust learning vision policy optimization sparse token").split()
+_CATEGORIES = ['cs.CL', 'cs.AI', 'cs.LG', 'cs.CV', 'cs.RO', 'cs.IR', 'stat.ML', 'stat.AP', 'math.OC']
+
+
+def _text(rng, n_words):
+    return ' '.join(rng.choice(_WORDS) for _ in range(n_words))
+
+
+def make_record(i, rng, set_spec='cs'):
+    """one-line raw xml of an OAI record in arXiv metadata format"""
+    arxiv_id = f"25{i // 100000 % 12 + 1:02d}.{i % 100000:05d}"
+    authors = ''.join(
+        f"<author><keyname>{_text(rng, 1).title()}</keyname>"
+        + (f"<forenames>{_text(rng, 1).title()}</forenames>" if rng.random() < 0.95 else '')
+        + ("<suffix>Jr</suffix>" if rng.random() < 0.02 else '')
+        + "</author>"
+        for _ in range(rng.randint(1, 12)))
+    optional = ''
+    if rng.random() < 0.6:
+        optional += f"<comments>{rng.randint(4, 40)} pages, {rng.randint(1, 12)} figures</comments>"
+    if rng.random() < 0.1:
+        optional += f"<journal-ref>Journal of {_text(rng, 2).title()} {rng.randint(1, 99)}</journal-ref>"
+    if rng.random() < 0.1:
+        optional += f"<doi>10.{rng.randint(1000, 9999)}/{arxiv_id}</doi>"
+    updated = "<updated>2025-01-02</updated>" if rng.random() < 0.3 else ''
+    categories = ' '.join(rng.sample(_CATEGORIES, rng.randint(1, 4)))
+    return (
+        '<record xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        f'<header><identifier>oai:arXiv.org:{arxiv_id}</identifier><datestamp>2025-01-{i % 28 + 1:02d}</datestamp>'
+        f'<setSpec>{set_spec}</setSpec></header><metadata>'
+        '<arXiv xmlns="http://arxiv.org/OAI/arXiv/" xsi:schemaLocation="http://arxiv.org/OAI/arXiv/ http://arxiv.org/OAI/arXiv.xsd">'
+        f'<id>{arxiv_id}</id><created>2025-01-01</created>{updated}<authors>{authors}</authors>'
+        f'<title>{_text(rng, rng.randint(5, 15)).capitalize()}</title><categories>{categories}</categories>{optional}'
+        '<license>http://creativecommons.org/licenses/by/4.0/</license>'
+        f'<abstract>  {_text(rng, rng.randint(120, 250)).capitalize()}. </abstract></arXiv></metadata></record>'
+    )
+
+
+def make_oai_fixture(path, n_records=20000, seed=0):
+    """write n_records synthetic records to path, return path"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n_records):
+            f.write(make_record(i, rng) + '\n')
+    return path
+
+
+def fixture_path(argv, n_records=20000):
+    """use harvest file from command line if given, otherwise generate one in a temp folder"""
+    if len(argv) > 1:
+        return argv[1]
+    import tempfile
+    path = os.path.join(tempfile.gettempdir(), f'oai_fixture_{n_records}.xml')
+    if not os.path.exists(path):
+        make_oai_fixture(path, n_records)
+    return path
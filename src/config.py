@@ -35,16 +35,26 @@ CONFIG = {
 
         'OAI_PAPER_TBL_NM': "oai_paper_pool",  # table for preprint paper metadata (batch trhough OAI)
         'OAI_PAPER_TBL_KEY': 'identifier',   # PK column for OAI_PAPER_TBL_NM
+        'OAI_WATERMARK_TBL_NM': "oai_harvest_watermark",  # table for highest OAI datestamp harvested per set
+        'OAI_CATEGORY_TBL_NM': "oai_paper_category",  # normalized paper-to-category table of OAI_PAPER_TBL_NM
+        'OAI_PAPER_TBL_INDEXES': ['insert_dt', 'arxiv_id', 'datestamp'],  # secondary indexes of OAI_PAPER_TBL_NM
+        'OAI_PAPER_TBL_FTS': ['title', 'abstract', 'authors'],  # full-text indexed columns of OAI_PAPER_TBL_NM
 
         'SS_PAPER_TBL_NM': "ss_paper_pool",  # table for all papers pool (use semantic scholar format)
 
         'DAILY_PAPER_TBL_NM': "daily_paper_pool", # table for daily recommended / discussed /reviewed papers
+        'DAILY_PAPER_TBL_INDEXES': ['insert_dt', 'source'],  # secondary indexes of DAILY_PAPER_TBL_NM
+        'DAILY_PAPER_TBL_FTS': ['title', 'abstract'],  # full-text indexed columns of DAILY_PAPER_TBL_NM
 
         'TW_TWEET_TBL_NM': "twitter_tweets_pool",  # table to store tweets data
         'TW_TWEET_TBL_KEY': 'id_str',
 
         'TW_ACCT_TBL_NM': "twitter_acct_pool",   # table to store followed accts
-        'TW_ACCT_TBL_KEY': 'user_id_str'
+        'TW_ACCT_TBL_KEY': 'user_id_str',
+
+        'EMBED_CACHE_DB_NAME': 'embedding_cache.db',  # persistent embedding cache, keyed by model and text hash
+        'EMBED_CACHE_MAX_ENTRIES': 200000,  # least recently used embeddings are evicted beyond this
+        'EMBED_STORE_DIR': 'embeddings',  # memory-mapped embeddings of pool papers, one matrix per model (under DB_PATH)
         },
     'LLM':{     # llm model settings
         'GEMINI_API_KEY': os.getenv('GEMINI_API_KEY_1'),
@@ -54,7 +64,12 @@ CONFIG = {
         'EMBEDDING_API_KEY': os.getenv('GEMINI_API_KEY_1'), # ngelect for ollama model
         'EMBEDDING_MODEL': "models/text-embedding-004", # "snowflake-arctic-embed2:latest",
         'EMBEDDING_MODEL_DIM': 1024,
-        'EMBEDDING_MODEL_MAX_TOKENS': 8192
+        'EMBEDDING_MODEL_MAX_TOKENS': 8192,
+        'EMBEDDING_REQUEST_MAX_TOKENS': 32768,  # token limit of one embedding request
+        'EMBEDDING_REQUEST_MAX_TEXTS': 100,  # text limit of one embedding request
+        'EMBEDDING_RPM': 1500,  # requests per minute quota of the embedding API
+        'EMBEDDING_TPM': 1000000,  # tokens per minute quota of the embedding API
+        'LOCAL_EMBEDDING_URL': os.getenv('LOCAL_EMBEDDING_URL', 'http://localhost:11434'),  # local ollama server
     },
     'API':{  # optional apis
         'ZOTERO_LIB_ID': os.getenv('ZOTERO_LIB_ID_1'),
@@ -0,0 +1,115 @@
+import sys
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Type
+
+OAI_PAPER_FIELDS = ("identifier", "datestamp", "setSpec", "arxiv_id", "created", "updated", "authors",
+                    "title", "categories", "comments", "journal_ref", "doi", "license", "abstract")
+
+DAILY_PAPER_FIELDS = ("title", "abstract", "paper_url", "tweet_url", "description",
+                      "source", "source_url", "extra_info")
+
+class PaperRecord:
+    """Compact paper record with one slot per field, in place of a plain dict per paper.
+    Note:
+        - Low-cardinality strings (dates, set, license, ...) are interned so that records share them.
+        - List fields (authors, categories) are kept as tuples, and turned back to lists in to_dict / to_row.
+        - Supports dict-style access (record['title'], record.get('title')) used across the pipeline.
+    """
+    __slots__ = ()
+    fields = ()
+    _intern_fields = frozenset()
+    _sequence_fields = frozenset()
+
+    def __init__(self, *values, **kwargs):
+        if len(values) > len(self.fields):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self.fields)} values, got {len(values)}")
+        intern_fields, sequence_fields = self._intern_fields, self._sequence_fields
+        for i, name in enumerate(self.fields):
+            value = values[i] if i < len(values) else kwargs.pop(name, None)
+            if value is not None:
+                if name in intern_fields and type(value) is str:
+                    value = sys.intern(value)
+                elif name in sequence_fields and isinstance(value, list):
+                    value = tuple(sys.intern(x) if type(x) is str and name in intern_fields else x for x in value)
+            object.__setattr__(self, name, value)
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} got unexpected fields: {', '.join(kwargs)}")
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        """build record from dict, keys outside of fields are dropped"""
+        return cls(*[data.get(name) for name in cls.fields])
+
+    @classmethod
+    def from_row(cls, row: Sequence):
+        """build record from a row of values in fields order"""
+        return cls(*row)
+
+    def to_row(self) -> tuple:
+        """values in fields order, with sequence fields as lists"""
+        sequence_fields = self._sequence_fields
+        return tuple(list(value) if name in sequence_fields and value is not None else value
+                     for name, value in zip(self.fields, self._values()))
+
+    def to_dict(self) -> Dict:
+        return dict(zip(self.fields, self.to_row()))
+
+    def _values(self):
+        return [getattr(self, name) for name in self.fields]
+
+    def keys(self):
+        return self.fields
+
+    def get(self, key, default=None):
+        if key in self.fields:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in zip(self.fields, self._values()))})"
+
+
+class OAIPaper(PaperRecord):
+    """preprint paper metadata harvested through OAI"""
+    __slots__ = OAI_PAPER_FIELDS
+    fields = OAI_PAPER_FIELDS
+    _intern_fields = frozenset(("datestamp", "setSpec", "created", "updated", "license", "categories"))
+    _sequence_fields = frozenset(("authors", "categories"))
+
+
+class DailyPaper(PaperRecord):
+    """daily recommended / discussed paper from HuggingFace, GitHub or Twitter"""
+    __slots__ = DAILY_PAPER_FIELDS
+    fields = DAILY_PAPER_FIELDS
+    _intern_fields = frozenset(("source", "source_url"))
+
+
+def records_to_frame(records: Iterable[PaperRecord], record_type: Optional[Type[PaperRecord]] = None) -> pd.DataFrame:
+    """convert records to DataFrame, one column per field"""
+    records = list(records)
+    if record_type is None:
+        record_type = type(records[0]) if records else PaperRecord
+    return pd.DataFrame.from_records([record.to_row() for record in records], columns=list(record_type.fields))
+
+def records_from_frame(df: pd.DataFrame, record_type: Type[PaperRecord]) -> List[PaperRecord]:
+    """convert DataFrame rows to records, columns outside of fields are dropped and missing values become None"""
+    columns = [name for name in record_type.fields if name in df.columns]
+    df = df[columns].astype(object)
+    df = df.where(df.notna(), None)
+    rows = df.itertuples(index=False, name=None)
+    if len(columns) == len(record_type.fields):
+        return [record_type.from_row(row) for row in rows]
+    return [record_type(**dict(zip(columns, row))) for row in rows]
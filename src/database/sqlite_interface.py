@@ -1,6 +1,17 @@
+import re
 import json
 import sqlite3
+import itertools
 import logging
+import pandas as pd
+from contextlib import contextmanager
+
+from database.sqlite_store import SQLiteStore
+
+try:
+    import orjson  # optional fast JSON encoder: pip install orjson
+except ImportError:
+    orjson = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -13,104 +24,281 @@ def sqlite_connect(db_name):
         print(f"Error connecting to database: {e}")
         return None
 
+@contextmanager
+def open_store(db_name):
+    """yield a SQLiteStore for db_name: the store itself if one is given, else one opened (and closed) for the file"""
+    if isinstance(db_name, SQLiteStore):
+        yield db_name
+        return
+    store = SQLiteStore(db_name)
+    try:
+        yield store
+    finally:
+        store.close()
+
 def df_to_sqlite(
         df, 
         table_name, 
         db_name, 
         id_key=None,
-        if_exists='append' 
+        if_exists='append',
+        on_conflict='ignore',
+        batch_size=10000,
+        indexes=None,
+        fts_columns=None
         ):   
     """import pandas DataFrame to SQLite database
     Args:
         :param pd.DataFrame df: DataFrame to import
         :param str table_name: table name to import to
-        :param str db_name: database name
+        :param str|SQLiteStore db_name: database name, or an open store to reuse its connection and schema cache
         :param str id_key: primary key for the table
         :param str if_exists: 'append' or 'replace'
+        :param str on_conflict: 'ignore' to keep stored rows whose id_key already exists, 'update' to overwrite them
+        :param int batch_size: rows per executemany call
+        :param list indexes: columns to keep a secondary index on (e.g. insert_dt), created if missing
+        :param list fts_columns: text columns to keep a full-text index on (e.g. title, abstract), see create_fts_index
     Returns:
-        :returns: None
+        :returns: True if data is written (or there is nothing new to write), False on error
     Note:
-        - If 'id_key' is provided, the function will check for existing records in the database and only insert new records.
+        - If 'id_key' is provided, SQLite resolves conflicts on it row by row (INSERT OR IGNORE / upsert), 
+          so the cost of an insert depends on the new rows only, not on the size of the table.
         - If 'if_exists' is set to 'replace', the function will replace the existing table with the new data.
         - If 'if_exists' is set to 'append', the function will append the new data to the existing table.
         - The code would automatically neglect columns that are not in the table.
         - The code would set the value of missing columns to None.
         - Automatically create table if not exist.
+        - The write is one transaction, or a savepoint inside the store's current transaction.
     """
-    conn = sqlite_connect(db_name)
-    if conn:
-        df_converted = df.copy()
-
-        try:
+    try:
+        with open_store(db_name) as store, store.transaction() as conn:
             # Check if the table exists
-            cursor = conn.cursor()
-            cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-            table_exists = cursor.fetchone() is not None
+            table_exists = store.table_exists(table_name)
+            if table_exists and if_exists == 'replace':
+                conn.execute(f"DROP TABLE {table_name}")
+                conn.execute(f"DROP TABLE IF EXISTS {table_name}_fts")
+                store.forget_schema(table_name)
+                store.forget_schema(f"{table_name}_fts")
+                table_exists = False
 
             # 1. Identify and Convert Dict/List-of-Dict Columns to JSON
             # This block of code must be placed before creating the table
-            for col in df_converted.columns:
-                if df_converted[col].dtype == 'object':
-                    df_converted[col] = df_converted[col].apply(lambda x: json.dumps(x, ensure_ascii=False) if any(isinstance(x, (dict, list)) for x in df_converted[col].dropna()) else str(x))
+            df_converted = serialize_object_columns(df)
 
             # Create table if it doesn't exist
             if not table_exists:
                 create_table_from_df(conn, df_converted, table_name, id_key)
+                store.forget_schema(table_name)
+
+            # Get the list of columns in the existing table, and keep only relevant columns 
+            # (missing columns are left out of the insert and default to None)
+            table_columns = set(store.table_columns(table_name)) # Using a set for faster lookup
+            columns = [col for col in df_converted.columns if col in table_columns]
+            if indexes:
+                create_indexes(store, table_name, indexes)
+            if fts_columns:
+                create_fts_index(store, table_name, fts_columns)
+
+            if df_converted.empty or not columns:
+                print(f"No new records to insert into '{table_name}'.")
+                return True
 
-            # Get the list of columns in the existing table
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            table_columns = {row[1] for row in cursor.fetchall()} # Using a set for faster lookup
-
-            if id_key and table_exists:
-                # Fetch existing IDs from the database
-                cursor.execute(f"SELECT DISTINCT {id_key} FROM {table_name}")
-                existing_ids = {row[0] for row in cursor.fetchall()}
-
-                # Filter out rows with IDs that already exist
-                df_converted = df_converted[~df_converted[id_key].isin(existing_ids)]
-
-            if df_converted.empty and table_exists:
-                print(f"No new records to insert into '{table_name}' (based on '{id_key}').")
-                return
-            
-            # --- Modification: Keep only relevant columns ---
-            if table_exists:
-                df_converted = df_converted.loc[:, df_converted.columns.isin(table_columns)]
-
-            # Add missing columns to the DataFrame and set values to None
-            if table_exists:
-                for col in table_columns:
-                    if col not in df_converted.columns:
-                        df_converted[col] = None
-
-            # Reorder DataFrame columns to match the table's column order
-            # Convert table_columns set back to a list for ordering
-            if table_exists:
-                df_converted = df_converted[list(table_columns)]
-            
-            # 2. Explicitly define SQLite types if needed
-            dtype_mapping = {}
-            for col_name, col_type in df_converted.dtypes.items():
-                if col_name == id_key:
-                    dtype_mapping[col_name] = "TEXT PRIMARY KEY"  # Assuming ID key is text
-                elif 'int' in str(col_type):
-                    dtype_mapping[col_name]  = "INTEGER"
-                elif 'float' in str(col_type):
-                    dtype_mapping[col_name]  = "REAL"
-                else:
-                    dtype_mapping[col_name]  = "TEXT"
-
-            df_converted.to_sql(
-                table_name, conn, if_exists=if_exists, index=False,
-                dtype=dtype_mapping
-                )
-            # df_converted.to_sql(table_name, conn, if_exists=if_exists, index=False)
-            print(f"Data successfully written to table '{table_name}' in '{db_name}'")
-        except Exception as e:
-            logger.error(f"Error writing to database: {e}")
-            print(f"Error writing to database: {e}")
-        finally:
-            conn.close()
+            statement_key = (table_name, tuple(columns), id_key, on_conflict)
+            if statement_key not in store.statements:
+                store.statements[statement_key] = _insert_sql(conn, table_name, columns, id_key, on_conflict)
+            insert_statements = store.statements[statement_key]
+
+            values = df_converted[columns].astype(object)
+            values = values.where(values.notna(), None)
+            rows = values.itertuples(index=False, name=None)
+            n_written = 0  # rowcount leaves out rows written by triggers (e.g. the full-text index)
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                for insert_sql in insert_statements:
+                    n_written += max(conn.executemany(insert_sql, batch).rowcount, 0)
+        print(f"{n_written} of {len(df_converted)} records written to table '{table_name}' in '{store.db_name}'")
+        return True
+    except Exception as e:
+        logger.error(f"Error writing to database: {e}")
+        print(f"Error writing to database: {e}")
+        return False
+
+def create_indexes(store, table_name, columns):
+    """create a secondary index per column of a table if missing, columns not in the table are skipped"""
+    index_key = (table_name, 'indexes', tuple(columns))
+    if index_key in store.statements:
+        return
+    table_columns = set(store.table_columns(table_name) or [])
+    for col in columns:
+        if col in table_columns:
+            store.conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_{col}" ON {table_name} ("{col}")')
+    store.statements[index_key] = ''
+
+def create_fts_index(store, table_name, columns, rebuild=False):
+    """keep an FTS5 full-text index `{table_name}_fts` over text columns of a table, created if missing
+    Args:
+        :param SQLiteStore store: open store, the index joins its current transaction
+        :param str table_name: table to index, e.g. oai_paper_pool
+        :param list columns: text columns to index, columns not in the table are skipped
+        :param bool rebuild: rebuild the index from the table, e.g. after a VACUUM renumbered its rowids
+    Note:
+        - The index is external-content: it holds tokens only and reads the text from the table by rowid.
+        - Triggers on the table keep it in sync, so rows written by any statement are indexed in the same transaction.
+        - Rows stored before the index existed are indexed when it is created.
+    """
+    fts_key = (table_name, 'fts', tuple(columns))
+    if fts_key in store.statements and not rebuild:
+        return
+    table_columns = set(store.table_columns(table_name) or [])
+    columns = [col for col in columns if col in table_columns]
+    if not columns:
+        return
+    fts_table = f"{table_name}_fts"
+    conn = store.conn
+    if not store.table_exists(fts_table):
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        new_values = ', '.join(f'new."{col}"' for col in columns)
+        old_values = ', '.join(f'old."{col}"' for col in columns)
+        conn.execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, content='{table_name}', "
+                     "content_rowid='rowid', tokenize='porter unicode61 remove_diacritics 2')")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table_name} BEGIN "
+                     f"INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.rowid, {new_values}); END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table_name} BEGIN "
+                     f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values}); END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table_name} BEGIN "
+                     f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values}); "
+                     f"INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.rowid, {new_values}); END")
+        store.forget_schema(fts_table)
+        rebuild = True
+    if rebuild:
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+    store.statements[fts_key] = fts_table
+
+def fts_query(text, match_all=True):
+    """turn free text into an FTS5 query of its quoted terms, so that punctuation and keywords (AND, NEAR) are literal
+    Args:
+        :param str text: free text, e.g. 'retrieval-augmented generation'
+        :param bool match_all: require all terms, otherwise any term (a broad lexical stage before embedding)
+    """
+    terms = [f'"{term}"' for term in re.findall(r'\w+', text or '')]
+    return (' ' if match_all else ' OR ').join(terms)
+
+def search_papers(db_name, table_name, query, limit=50, columns=None, raw=False, match_all=True):
+    """keyword search over the full-text index of a table, best matches first by BM25
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store
+        :param str table_name: indexed table, e.g. oai_paper_pool
+        :param str query: free text, or an FTS5 query if raw (e.g. 'title:diffusion AND abstract:"protein folding"')
+        :param int limit: max papers to return
+        :param list columns: columns to return, all columns if None
+        :param bool raw: pass query to FTS5 as it is
+        :param bool match_all: for free text, require all terms instead of any
+    Returns:
+        :returns: list of dicts of paper columns plus 'score' (BM25, higher is better)
+    """
+    match = query if raw else fts_query(query, match_all)
+    if not match:
+        return []
+    fts_table = f"{table_name}_fts"
+    try:
+        with open_store(db_name) as store:
+            if not store.table_exists(fts_table):
+                logger.warning(f"Table '{table_name}' has no full-text index.")
+                return []
+            columns = list(columns) if columns else store.table_columns(table_name)
+            select_cols = ', '.join(f'p."{col}"' for col in columns)
+            sql = (f"SELECT {select_cols}, -f.rank FROM {fts_table} f JOIN {table_name} p ON p.rowid = f.rowid "
+                   f"WHERE {fts_table} MATCH ? ORDER BY f.rank LIMIT ?")
+            rows = store.query(sql, (match, int(limit)))
+            return [dict(zip(columns + ['score'], row)) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Error searching '{table_name}': {e}")
+        return []
+
+def _json_dumps(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode('utf-8')
+        except TypeError:  # e.g. non-str dict keys, numpy scalars
+            pass
+    return json.dumps(value, ensure_ascii=False, default=lambda x: x.item() if hasattr(x, 'item') else str(x))
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)  # value != value: NaN
+
+def serialize_object_columns(df):
+    """convert object columns to values SQLite can store, in one pass per column
+    Args:
+        :param pd.DataFrame df: DataFrame to convert, left unchanged
+    Returns:
+        :returns: DataFrame with object columns holding dicts / lists encoded as JSON strings, 
+                  other values as strings, and missing values as None
+    Note:
+        - A column is JSON if any of its values is a dict or list, it is then JSON-encoded as a whole.
+        - orjson is used to encode if installed, json otherwise.
+    """
+    converted = {}
+    for col in df.columns:
+        if df[col].dtype != 'object' and not str(df[col].dtype).startswith(('str', 'string')):
+            continue
+        values = df[col].tolist()
+        is_json = any(isinstance(x, (dict, list)) for x in values)
+        if is_json:
+            converted[col] = [None if _is_missing(x) else _json_dumps(x) for x in values]
+        else:
+            converted[col] = [x if type(x) is str else (None if _is_missing(x) else str(x)) for x in values]
+    if not converted:
+        return df
+    df = df.copy(deep=False)
+    for col, values in converted.items():
+        df[col] = pd.Series(values, index=df.index, dtype=object)
+    return df
+
+def _insert_sql(conn, table_name, columns, id_key, on_conflict='ignore'):
+    """parameterized statements that write a row and let SQLite resolve conflicts on id_key
+    Returns:
+        tuple of statements, each executed in order with the same row of values
+    """
+    column_list = ', '.join(f'"{col}"' for col in columns)
+    placeholders = ', '.join('?' * len(columns))
+    if not id_key or id_key not in columns:
+        return (f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})",)
+
+    if not _has_unique_key(conn, table_name, id_key):
+        # tables created without a key on id_key: add a unique index so that conflicts can be detected
+        try:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table_name}_{id_key}" ON {table_name} ("{id_key}")')
+        except sqlite3.IntegrityError:
+            # duplicates are already stored, fall back to an indexed existence check per row
+            logger.warning(f"Table '{table_name}' holds duplicate '{id_key}', unable to add a unique index on it.")
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_{id_key}" ON {table_name} ("{id_key}")')
+            key_pos = columns.index(id_key)
+            insert_absent = (f"INSERT INTO {table_name} ({column_list}) SELECT {placeholders} "
+                             f'WHERE NOT EXISTS (SELECT 1 FROM {table_name} WHERE "{id_key}" = ?{key_pos + 1})')
+            updates = ', '.join(f'"{col}" = ?{i + 1}' for i, col in enumerate(columns) if col != id_key)
+            if on_conflict == 'update' and updates:
+                # update stored rows of the key first, then insert the row if the key is new
+                return (f'UPDATE {table_name} SET {updates} WHERE "{id_key}" = ?{key_pos + 1}', insert_absent)
+            return (insert_absent,)
+
+    if on_conflict == 'update':
+        updates = ', '.join(f'"{col}" = excluded."{col}"' for col in columns if col != id_key)
+        if updates:
+            return (f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders}) "
+                    f'ON CONFLICT("{id_key}") DO UPDATE SET {updates}',)
+    return (f"INSERT OR IGNORE INTO {table_name} ({column_list}) VALUES ({placeholders})",)
+
+def _has_unique_key(conn, table_name, column):
+    """whether column alone is the primary key or has a unique index"""
+    pk_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})") if row[5]]
+    if pk_columns == [column]:
+        return True
+    for _, index_name, unique, *_ in conn.execute(f"PRAGMA index_list({table_name})"):
+        if unique and [row[2] for row in conn.execute(f'PRAGMA index_info("{index_name}")')] == [column]:
+            return True
+    return False
 
 def create_table_from_df(conn, df, table_name, id_key):
     """Creates a table in the SQLite database based on the DataFrame structure."""
@@ -129,5 +317,153 @@ def create_table_from_df(conn, df, table_name, id_key):
     create_table_sql = f"CREATE TABLE {table_name} ({', '.join(columns_sql)})"
     cursor = conn.cursor()
     cursor.execute(create_table_sql)
-    conn.commit()
-    print(f"Table '{table_name}' created successfully.")
\ No newline at end of file
+    print(f"Table '{table_name}' created successfully.")
+
+def get_oai_watermarks(db_name, watermark_table, paper_table=None):
+    """get the highest OAI datestamp harvested per set
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store
+        :param str watermark_table: table keeping the high-water mark per set
+        :param str paper_table: optional OAI paper table, to bootstrap sets without a recorded mark from stored papers
+    Returns:
+        :returns: dict of set to datestamp in YYYY-MM-DD format
+    """
+    watermarks = {}
+    try:
+        with open_store(db_name) as store:
+            if paper_table and store.table_exists(paper_table):
+                rows = store.query(f'SELECT "setSpec", MAX("datestamp") FROM {paper_table} GROUP BY "setSpec"')
+                watermarks.update({set_spec: datestamp for set_spec, datestamp in rows if set_spec and datestamp})
+            if store.table_exists(watermark_table):
+                watermarks.update(dict(store.query(f"SELECT set_spec, datestamp FROM {watermark_table}")))  # recorded marks take precedence
+    except sqlite3.Error as e:
+        logger.error(f"Error reading OAI watermarks: {e}")
+    return watermarks
+
+def update_oai_watermarks(db_name, watermark_table, watermarks):
+    """record the highest OAI datestamp harvested per set, a mark never moves backwards
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store (the update joins its current transaction)
+        :param str watermark_table: table keeping the high-water mark per set
+        :param dict watermarks: dict of set to datestamp in YYYY-MM-DD format
+    """
+    if not watermarks:
+        return
+    try:
+        with open_store(db_name) as store, store.transaction() as conn:
+            if not store.table_exists(watermark_table):
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {watermark_table} "
+                             "(set_spec TEXT PRIMARY KEY, datestamp TEXT NOT NULL, updated_at TEXT)")
+                store.forget_schema(watermark_table)
+            conn.executemany(
+                f"INSERT INTO {watermark_table} (set_spec, datestamp, updated_at) VALUES (?, ?, datetime('now')) "
+                "ON CONFLICT(set_spec) DO UPDATE SET datestamp = MAX(datestamp, excluded.datestamp), updated_at = excluded.updated_at",
+                list(watermarks.items()))
+    except sqlite3.Error as e:
+        logger.error(f"Error writing OAI watermarks: {e}")
+
+def fetch_rows_by_keys(db_name, table_name, key_col, keys, columns, chunk_size=500):
+    """fetch rows of a table by a list of keys, in chunks to stay within SQLite's variable limit
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store
+        :param str table_name: table to look up
+        :param str key_col: column to match keys against
+        :param list keys: keys to look up
+        :param list columns: columns to return
+        :param int chunk_size: keys per query
+    Returns:
+        :returns: dict of key to dict of columns, keys not found (or a missing table) are simply absent
+    """
+    keys = list(dict.fromkeys(k for k in keys if k is not None))
+    if not keys:
+        return {}
+    rows = {}
+    try:
+        with open_store(db_name) as store:
+            if not store.table_exists(table_name):
+                return {}
+            select_cols = ', '.join(f'"{col}"' for col in [key_col] + list(columns))
+            with store.reader() as conn:
+                for i in range(0, len(keys), chunk_size):
+                    chunk = keys[i:i + chunk_size]
+                    placeholders = ', '.join('?' * len(chunk))
+                    cursor = conn.execute(f'SELECT {select_cols} FROM {table_name} WHERE "{key_col}" IN ({placeholders})', chunk)
+                    for row in cursor.fetchall():
+                        rows.setdefault(row[0], dict(zip(columns, row[1:])))
+    except sqlite3.Error as e:
+        logger.error(f"Error reading from database: {e}")
+    return rows
+
+def update_paper_categories(db_name, category_table, paper_ids, categories, paper_table=None, id_key='identifier'):
+    """record paper-to-category pairs in a normalized table, so category filters run as index lookups
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store (the update joins its current transaction)
+        :param str category_table: paper-to-category table, created if missing
+        :param list paper_ids: paper keys (e.g. OAI identifier)
+        :param list categories: list of categories of each paper
+        :param str paper_table: paper table with a JSON `categories` column, to fill a newly created table from
+        :param str id_key: key column of paper_table
+    Returns:
+        :returns: True if written, False on error
+    """
+    rows = [(paper_id, category) for paper_id, paper_categories in zip(paper_ids, categories)
+            if paper_id is not None and paper_categories
+            for category in paper_categories]
+    try:
+        with open_store(db_name) as store, store.transaction() as conn:
+            if not store.table_exists(category_table):
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {category_table} "
+                             "(paper_id TEXT NOT NULL, category TEXT NOT NULL, PRIMARY KEY (category, paper_id)) WITHOUT ROWID")
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{category_table}_paper_id" ON {category_table} (paper_id)')
+                store.forget_schema(category_table)
+                if paper_table and 'categories' in (store.table_columns(paper_table) or []):
+                    # papers stored before the table existed
+                    conn.execute(
+                        f'INSERT OR IGNORE INTO {category_table} (paper_id, category) '
+                        f'SELECT p."{id_key}", j.value FROM {paper_table} p, json_each(p.categories) j '
+                        f'WHERE json_valid(p.categories) AND json_type(p.categories) = \'array\'')
+            conn.executemany(f"INSERT OR IGNORE INTO {category_table} (paper_id, category) VALUES (?, ?)", rows)
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error writing paper categories: {e}")
+        return False
+
+def get_papers_by_category(db_name, paper_table, category_table, categories, id_key='identifier',
+                           from_date=None, until_date=None, date_col='insert_dt', columns=None):
+    """query papers in any of the categories, optionally within a date range, as index lookups
+    Args:
+        :param str|SQLiteStore db_name: database name, or an open store
+        :param str paper_table: paper table (e.g. oai_paper_pool)
+        :param str category_table: paper-to-category table of paper_table
+        :param list categories: categories to match, e.g. ['cs.CL', 'cs.AI']
+        :param str id_key: key column of paper_table
+        :param str from_date: keep papers with date_col >= from_date
+        :param str until_date: keep papers with date_col <= until_date
+        :param str date_col: date column to filter on, e.g. insert_dt or datestamp
+        :param list columns: columns to return, all columns if None
+    Returns:
+        :returns: list of dicts of paper columns, newest first by date_col
+    """
+    if not categories:
+        return []
+    try:
+        with open_store(db_name) as store:
+            if not store.table_exists(paper_table) or not store.table_exists(category_table):
+                return []
+            columns = list(columns) if columns else store.table_columns(paper_table)
+            select_cols = ', '.join(f'p."{col}"' for col in columns)
+            placeholders = ', '.join('?' * len(categories))
+            sql = (f'SELECT {select_cols} FROM {paper_table} p WHERE p."{id_key}" IN '
+                   f'(SELECT paper_id FROM {category_table} WHERE category IN ({placeholders}))')
+            params = list(categories)
+            if from_date is not None:
+                sql += f' AND p."{date_col}" >= ?'
+                params.append(from_date)
+            if until_date is not None:
+                sql += f' AND p."{date_col}" <= ?'
+                params.append(until_date)
+            sql += f' ORDER BY p."{date_col}" DESC'
+            return [dict(zip(columns, row)) for row in store.query(sql, params)]
+    except sqlite3.Error as e:
+        logger.error(f"Error reading from database: {e}")
+        return []
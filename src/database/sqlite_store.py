@@ -0,0 +1,134 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class SQLiteStore:
+    def __init__(self, db_name: str, n_readers: int = 4, cache_size_mb: int = 64, mmap_size_mb: int = 256,
+                 busy_timeout_ms: int = 10000):
+        """Long-lived handle of a SQLite database (e.g. trending_papers.db): one writer connection and a small pool of readers.
+        Args:
+            db_name (str): database file.
+            n_readers (int): read-only connections kept open for reuse.
+            cache_size_mb (int): page cache per connection.
+            mmap_size_mb (int): memory-mapped I/O per connection.
+            busy_timeout_ms (int): how long to wait on a lock held by another process.
+        Note:
+            - The database runs in WAL mode with synchronous=NORMAL: readers (e.g. a reporting job, in this or
+              another process) keep querying while the daily ingest writes, and commits skip the fsync per transaction.
+            - Writes go through the one writer connection. transaction() groups related writes into one commit;
+              nested transaction() calls become savepoints, so an inner failure rolls back only its own part.
+            - Table columns and prepared INSERT statements are cached, call forget_schema() after altering a table by hand.
+        """
+        self.db_name = db_name
+        self.n_readers = n_readers
+        self._pragmas = [
+            f"PRAGMA busy_timeout = {int(busy_timeout_ms)}",
+            "PRAGMA synchronous = NORMAL",
+            "PRAGMA temp_store = MEMORY",
+            f"PRAGMA cache_size = {-int(cache_size_mb) * 1024}",
+            f"PRAGMA mmap_size = {int(mmap_size_mb) * 1024 * 1024}",
+        ]
+        # autocommit mode, transactions are explicit
+        self.conn = sqlite3.connect(db_name, check_same_thread=False, isolation_level=None)
+        journal_mode = self.conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            logger.warning(f"Unable to switch {db_name} to WAL mode, journal mode is '{journal_mode}'.")
+        self._configure(self.conn)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._readers = queue.LifoQueue()
+        self._columns: Dict[str, Optional[List[str]]] = {}
+        self.statements: Dict[tuple, object] = {}  # cache of generated SQL (and of indexes created), keyed by its inputs
+
+    def _configure(self, conn):
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextmanager
+    def transaction(self):
+        """group writes into one transaction (a savepoint if nested), committed on success, rolled back on error
+        A rollback also drops the cached schema, which may describe tables created or altered inside it.
+        """
+        with self._lock:
+            depth = self._depth
+            savepoint = f"sp_{depth}"
+            self.conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                if depth == 0:
+                    self.conn.execute("ROLLBACK")
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.conn.execute(f"RELEASE {savepoint}")
+                self.forget_schema()  # tables created or dropped inside were rolled back too
+                raise
+            else:
+                self.conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+            finally:
+                self._depth -= 1
+
+    def table_columns(self, table_name: str) -> Optional[List[str]]:
+        """columns of a table in order, None if the table does not exist"""
+        if table_name not in self._columns:
+            with self._lock:
+                columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table_name}")')]
+            self._columns[table_name] = columns or None
+        return self._columns[table_name]
+
+    def table_exists(self, table_name: str) -> bool:
+        return self.table_columns(table_name) is not None
+
+    def forget_schema(self, table_name: Optional[str] = None):
+        """drop cached schema of a table (or of all tables) after it is created, dropped or altered"""
+        if table_name is None:
+            self._columns.clear()
+            self.statements.clear()
+        else:
+            self._columns.pop(table_name, None)
+            self.statements = {k: v for k, v in self.statements.items() if k[0] != table_name}
+
+    @contextmanager
+    def reader(self):
+        """read-only connection from the pool, it sees committed data only and never blocks the writer"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self._configure(conn)
+            conn.execute("PRAGMA query_only = ON")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._readers.qsize() < self.n_readers:
+                self._readers.put(conn)
+            else:
+                conn.close()
+
+    def query(self, sql: str, params=()) -> list:
+        """run a read query on a pooled reader, return all rows"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.conn.close()
@@ -1,3 +1,4 @@
+import os
 import re
 import json
 import time
@@ -10,15 +11,21 @@ from config import CONFIG
 from tools.web_search_tool import WebSearch
 from tools.twitter_tool import TwitterKit
 from tools.arxiv_tool import ArxivKit
+from database.paper_records import DailyPaper
+from database.sqlite_interface import fetch_rows_by_keys
 
 
 class PapersDiscussed:
     def __init__(
             self,  
-            followed_accts: Optional[List[str]] = CONFIG['TWITTER']['FOLLOWED_ACCTS']):
+            followed_accts: Optional[List[str]] = CONFIG['TWITTER']['FOLLOWED_ACCTS'],
+            data_path: Optional[str] = CONFIG['DATABASE']['DB_PATH'],
+            db_name: Optional[str] = CONFIG['DATABASE']['DB_NAME']):
         """Find out papers that discussed in social medium
         """
         self.followed_accts = followed_accts
+        self.data_path = data_path
+        self.db_name = os.path.join(data_path, db_name)
         self.website = CONFIG['TWITTER']['DETECTED_WEBSITE']
         self.url_pattern = r"(" + "|".join(map(lambda x: x.replace(".", r"\."), self.website)) + ")"
 
@@ -81,7 +88,7 @@ class PapersDiscussed:
                 if re.search(self.url_pattern, item.get('expanded_url', 'NA')):
                     paper_url = item.get('expanded_url')
                     if 'arxiv.org' in paper_url:
-                        arxiv_no = paper_url.split('/')[-1]
+                        arxiv_no = re.sub(r'\.pdf$', '', paper_url.rstrip('/').split('/')[-1])
                         arxiv_id = re.sub(r'v\d+$', '', arxiv_no)
                         version = re.search(r'v\d+$', arxiv_no)
                         tweet_arxiv_info.append({'x_tweet_id': tweet_id, 
@@ -92,23 +99,59 @@ class PapersDiscussed:
         return tweet_arxiv_info
     
     
+    def resolve_arxiv_papers(self, arxiv_ids: List[str], batch_size: int = 100) -> Dict[str, Dict]:
+        """resolve arxiv ids to title, abstract and url, looking up the local paper pool first
+        Args:
+            arxiv_ids: list of arxiv ids (without version)
+            batch_size: max ids per arxiv API request for the ones not found locally
+        Returns:
+            dict of arxiv id to paper info, ids that could not be resolved are absent
+        """
+        arxiv_ids = list(dict.fromkeys(x for x in arxiv_ids if x))
+        local_papers = fetch_rows_by_keys(
+            self.db_name,
+            table_name=CONFIG['DATABASE']['OAI_PAPER_TBL_NM'],
+            key_col='arxiv_id',
+            keys=arxiv_ids,
+            columns=['title', 'abstract'])
+        resolved = {
+            arxiv_id: {"title": paper.get('title'),
+                       "abstract": paper.get('abstract'),
+                       "paper_url": f"https://arxiv.org/abs/{arxiv_id}"}
+            for arxiv_id, paper in local_papers.items()}
+
+        missing_ids = [x for x in arxiv_ids if x not in resolved]
+        print(f"Resolved {len(resolved)} arxiv papers locally, {len(missing_ids)} to fetch from arxiv API.")
+        if missing_ids:
+            arxiv = ArxivKit(self.data_path)
+            for i in range(0, len(missing_ids), batch_size):
+                btch_ids = missing_ids[i: i + batch_size]
+                for meta in arxiv.retrieve_metadata_by_paper(paper_ids=btch_ids, max_cnt=len(btch_ids)):
+                    # match by id in the response, since the API may drop or reorder entries
+                    arxiv_id = re.sub(r'v\d+$', '', meta.get('id', '').split('/abs/')[-1])
+                    resolved[arxiv_id] = {"title": meta.get('title'),
+                                          "abstract": meta.get('summary'),
+                                          "paper_url": meta.get('id')}
+        return resolved
+
     def retieve_paper_meta(self, tweet_arxiv_info):
-        arxiv = ArxivKit()
-        arxiv_ids = [x.get('arxiv_id') for x in tweet_arxiv_info]
-        papers_metadata = arxiv.retrieve_metadata_by_paper(paper_ids=arxiv_ids)
+        resolved = self.resolve_arxiv_papers([x.get('arxiv_id') for x in tweet_arxiv_info])
 
         papers_info = []
-        for idx, meta in enumerate(papers_metadata):
-            related_info = tweet_arxiv_info[idx]
-            paper_info = {
-                    "title": meta.get('title'),
-                    "abstract": meta.get('summary'),
-                    "paper_url": meta.get('id'),
-                    "tweet_url": f"https://x.com/{related_info.get('x_screen_name')}/status/{related_info.get('x_tweet_id')}",
-                    "description": related_info.get('x_full_text'),
-                    "source": "twitter",
-                    "source_url": f"https://x.com/{related_info.get('x_screen_name')}",
-                    "extra_info": related_info,
-                }
+        for related_info in tweet_arxiv_info:
+            meta = resolved.get(related_info.get('arxiv_id'))
+            if meta is None:
+                print(f"Unable to resolve arxiv paper {related_info.get('arxiv_id')}.")
+                continue
+            paper_info = DailyPaper(
+                    title=meta.get('title'),
+                    abstract=meta.get('abstract'),
+                    paper_url=meta.get('paper_url'),
+                    tweet_url=f"https://x.com/{related_info.get('x_screen_name')}/status/{related_info.get('x_tweet_id')}",
+                    description=related_info.get('x_full_text'),
+                    source="twitter",
+                    source_url=f"https://x.com/{related_info.get('x_screen_name')}",
+                    extra_info=related_info,
+                )
             papers_info.append(paper_info)
         return papers_info
@@ -1,43 +1,93 @@
-import time
-from typing import List, Dict
+import asyncio
+from typing import List, Dict, Optional
 
 from tools.arxiv_tool import ArxivKit
+from database.paper_records import OAIPaper
 
 class PapersPreprint:
     def __init__(self, data_path):
         self.data_path = data_path
         self.arxiv = ArxivKit(self.data_path)
+        self.latest_datestamps = {}  # highest OAI datestamp seen per domain in the last pull
     
     async def pull_arxiv_metadata(
             self,
             domains: List[str], 
-            from_date: str,   # date in "yyyy-mm-dd" format
+            from_date: str | Dict[str, str],   # date in "yyyy-mm-dd" format
             until_date: str,  # keep date length within 30 days to avoid rate limit
-            ) -> List[Dict]:
-        """pull arxiv metadata by domain"""
+            ) -> List[OAIPaper]:
+        """pull arxiv metadata by domain
+        Args:
+            from_date: a date for all domains, or a dict of date per domain
+                (e.g. from harvest_from_dates), domains with from_date later than until_date are skipped.
+        Note:
+            Domains are harvested concurrently. Requests to export.arxiv.org are spaced out by
+            the rate governor shared across the domains, so no extra pause is needed in between.
+            Records are turned into compact OAIPaper records batch by batch as they are parsed.
+        """
+        from_dates = from_date if isinstance(from_date, dict) else {domain: from_date for domain in domains}
+        domains = [domain for domain in domains if from_dates[domain] <= until_date]
+        results = await asyncio.gather(*[
+            self._pull_domain_metadata(domain, from_dates[domain], until_date)
+            for domain in domains])
+
         daily_papers_metadata = []
-        for domain in domains:
-            # get papers metadata
-            papers_metadata = await self.arxiv.retrieve_metadata_by_category(
-                category=domain, 
-                from_date=from_date, 
-                until_date=until_date)
+        for papers_metadata in results:
             daily_papers_metadata.extend(papers_metadata)
-            time.sleep(10)
         return daily_papers_metadata
+
+    async def _pull_domain_metadata(self, domain, from_date, until_date) -> List[OAIPaper]:
+        papers_metadata = []
+        async for batch in self.arxiv.stream_category_metadata(
+                category=domain,
+                from_date=from_date,
+                until_date=until_date,
+                archive_path=self.data_path,
+                batch_size=1000):
+            papers_metadata.extend(OAIPaper.from_dict(x) for x in batch)
+            latest = max(x['datestamp'] for x in batch)
+            if latest > self.latest_datestamps.get(domain, ''):
+                self.latest_datestamps[domain] = latest
+        return papers_metadata
+
+    @staticmethod
+    def harvest_from_dates(
+            domains: List[str],
+            watermarks: Dict[str, str],
+            default_from_date: str) -> Dict[str, str]:
+        """get from_date per domain for an incremental harvest
+        Args:
+            domains: list of domains to harvest
+            watermarks: highest OAI datestamp already harvested per domain
+            default_from_date: from_date for domains never harvested before
+        Returns:
+            dict of from_date per domain, the day of its watermark
+        Note:
+            OAI datestamps only have day precision, so records may still be stamped on the watermark day
+            after the last run. That day is harvested again, its records already stored are ignored by key.
+        """
+        from_dates = {}
+        for domain in domains:
+            watermark: Optional[str] = watermarks.get(domain)
+            if watermark:
+                from_dates[domain] = watermark[:10]
+            else:
+                from_dates[domain] = default_from_date
+        return from_dates
     
     def filter_by_category(
             self, 
-            paper_metadata: List[Dict], 
-            categories: List[str]) -> List[Dict]:
+            paper_metadata: List[OAIPaper], 
+            categories: List[str]) -> List[OAIPaper]:
         """further filter papers by category
         Args:
             categories: list of categories, which could be found from https://arxiv.org/category_taxonomy
             paper_metadata: list of paper metadata 
         """
+        categories = set(categories)
         filtered_papers_metadata = []
         for paper in paper_metadata:
             paper_belongto = paper.get('categories')  # here is a list
-            if bool(set(paper_belongto) & set(categories)):
+            if not categories.isdisjoint(paper_belongto):
                 filtered_papers_metadata.append(paper)
         return filtered_papers_metadata
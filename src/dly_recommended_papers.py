@@ -7,6 +7,7 @@ import json
 from config import CONFIG
 from tools.github_tool import GitHubKit
 from tools.huggingface_tool import HuggingFaceKit
+from database.paper_records import DailyPaper
 
 class PapersRecommended:
     def __init__(self, firecrawl_api_key=None):
@@ -46,7 +47,7 @@ class PapersRecommended:
             return json.dumps(papers, indent=2)
 
         papers = json.loads(extract_paper_info(readme))
-        return papers
+        return [DailyPaper.from_dict(x) for x in papers]
 
     def get_huggingface_daily_papers(self):
         huggingface = HuggingFaceKit(max_retries_cnt=3, firecrawl_api_key=self.firecrawl_api_key)
@@ -58,15 +59,15 @@ class PapersRecommended:
                 url = f"https://arxiv.org/abs/{item.get('id')}" 
             else:
                 url = None
-            paper = {
-                "title": item.get('title').replace("\n", ""),
-                "abstract": item.get('summary').replace("\n", " "),
-                "paper_url": url,
-                "tweet_url": None,
-                "description": None,
-                "source": "huggingface",
-                "source_url": self.hugginface_url,
-                "extra_info": item
-            }
+            paper = DailyPaper(
+                title=item.get('title').replace("\n", ""),
+                abstract=item.get('summary').replace("\n", " "),
+                paper_url=url,
+                tweet_url=None,
+                description=None,
+                source="huggingface",
+                source_url=self.hugginface_url,
+                extra_info=item
+            )
             papers.append(paper)
         return papers
\ No newline at end of file
@@ -1,6 +1,98 @@
 import numpy as np
-from typing import List, Dict, Optional
-from models.default_models import gemini_embedding_async, semantic_similarity_matrix
+from typing import Iterable, List, Dict, Optional, Tuple
+from models.default_models import gemini_embedding_async
+from models.similarity import cosine_similarity_blocks, cosine_similarity_matrix, int8_similarity_blocks, normalize_embeddings, quantize_int8
+from models.embed_cache import EmbeddingCache, cached_embedding_async
+from models.embed_store import EmbeddingStore
+from models.ann_index import IVFIndex
+
+def select_top_matches(
+        similarity_blocks: Iterable[Tuple[int, np.ndarray]],
+        threshold: float,
+        top_k: Optional[int],
+        n_matched: int = 3) -> List[Dict]:
+    """select candidates above threshold with best similarity, block by block
+    Args:
+        similarity_blocks: (start column, (n_benchmarks, n_block) similarity matrix) of consecutive candidate blocks,
+            NaN similarities (texts that could not be embedded) never match
+        threshold: a candidate matches if any benchmark's similarity is above it
+        top_k: candidates to keep, by best similarity, None keeps every match
+        n_matched: best benchmarks to report per candidate
+    Returns:
+        list of {"candidate_index", "matched_info"}, best match first
+    """
+    cols = np.empty(0, dtype=np.int64)
+    best = np.empty(0, dtype=np.float32)
+    rows, values = None, None  # (n_matched, n_kept) best benchmarks of kept columns
+    for start, block in similarity_blocks:
+        block = np.asarray(block, dtype=np.float32)
+        if np.isnan(block).any():  # rows / columns of texts that could not be embedded never match
+            block = np.where(np.isnan(block), -np.inf, block)
+        if block.shape[0] == 0:  # no benchmarks, nothing can match
+            continue
+        block_best = block.max(axis=0)
+        block_cols = np.flatnonzero(block_best > threshold)
+        if top_k is not None and len(block_cols) > top_k:
+            block_cols = block_cols[np.argpartition(-block_best[block_cols], top_k - 1)[:top_k]]
+        if len(block_cols) == 0:
+            continue
+        sub = block[:, block_cols]
+        n = min(n_matched, sub.shape[0])
+        if sub.shape[0] > n:
+            block_rows = np.argpartition(-sub, n - 1, axis=0)[:n]
+        else:
+            block_rows = np.broadcast_to(np.arange(n)[:, None], sub.shape)
+        block_values = np.take_along_axis(sub, block_rows, axis=0)
+
+        cols = np.concatenate([cols, start + block_cols])
+        best = np.concatenate([best, block_best[block_cols]])
+        rows = block_rows if rows is None else np.concatenate([rows, block_rows], axis=1)
+        values = block_values if values is None else np.concatenate([values, block_values], axis=1)
+        if top_k is not None and len(cols) > top_k:
+            keep = np.argpartition(-best, top_k - 1)[:top_k]
+            cols, best, rows, values = cols[keep], best[keep], rows[:, keep], values[:, keep]
+
+    if len(cols) == 0:
+        return []
+    order = np.lexsort((cols, -best))  # best similarity first, ties in candidate order
+    match_results = []
+    for k in order:
+        benchmark_order = np.argsort(-values[:, k], kind='stable')
+        matched_info = [{"row_index": int(rows[i, k]), "similarity": values[i, k].item()}
+                        for i in benchmark_order if values[i, k] > threshold]
+        match_results.append({"candidate_index": int(cols[k]), "matched_info": matched_info})
+    return match_results
+
+def select_top_matches_int8(
+        benchmarks_embeds: np.ndarray,
+        codes: np.ndarray,
+        scales: np.ndarray,
+        full_vectors: np.ndarray,
+        threshold: float,
+        top_k: Optional[int],
+        block_cols: int = 65536,
+        margin: float = 0.02,
+        shortlist_factor: int = 4) -> List[Dict]:
+    """select_top_matches over int8-quantized candidates, with the shortlist re-scored in full precision
+    Args:
+        codes, scales: int8 candidates, from quantize_int8 or EmbeddingStore.quantized()
+        full_vectors: float candidates in the same order, only the shortlist's rows are read
+        margin: the shortlist is taken at threshold - margin, so that candidates just above threshold are not lost to rounding
+        shortlist_factor: the shortlist holds shortlist_factor * top_k candidates (every one above threshold - margin if top_k is None)
+    Returns:
+        list of {"candidate_index", "matched_info"}, best match first, with full precision similarities
+    """
+    shortlist_k = None if top_k is None else max(top_k * shortlist_factor, top_k + 16)
+    shortlist = select_top_matches(int8_similarity_blocks(benchmarks_embeds, codes, scales, block_cols),
+                                   threshold - margin, shortlist_k)
+    if not shortlist:
+        return []
+    cols = np.sort([x["candidate_index"] for x in shortlist])
+    exact = cosine_similarity_matrix(benchmarks_embeds, np.asarray(full_vectors[cols]))
+    match_results = select_top_matches([(0, exact)], threshold, top_k)
+    for x in match_results:
+        x["candidate_index"] = int(cols[x["candidate_index"]])
+    return match_results
 
 async def filter_by_topics(
         api_key,
@@ -9,42 +101,102 @@ async def filter_by_topics(
         candidates: List[str],  # list of strings (like keywords, titles, abstracts)
         threshold: Optional[float] = 0.7, 
         top_k: Optional[int] = 10,
-        n_concurrent: Optional[int] = 5):
+        n_concurrent: Optional[int] = 5,
+        cache: Optional[EmbeddingCache] = None,
+        store: Optional[EmbeddingStore] = None,
+        candidate_ids: Optional[List[Optional[str]]] = None,
+        block_cols: Optional[int] = 65536,
+        embed_fn = gemini_embedding_async,
+        quantized: bool = False):
     """based on user's preference match candidates papers' abstract to existing benchmark papers'
     Args:
         benchmarks: a list of keywords, titles, or abstracts of existing papers
         candidate_metadata: list of OAI metadata
+        top_k: candidates to keep, None keeps every match
+        cache: optional embedding cache, only texts missing from it are embedded
+        store: optional embedding store, candidates' embeddings are appended to it for later re-ranking
+        candidate_ids: identifiers of candidates in the store (e.g. OAI identifier), None for ones not to store
+        block_cols: candidates to select from at a time, bounds memory use
+        embed_fn: embedding backend, gemini_embedding_async or local_embedding_async
+        quantized: score candidates as int8 and re-score only the shortlist in full precision
     Returns:
-        list of paper metadata after filter the non-matches
+        list of paper metadata after filter the non-matches, best match first
         list of matching information
     """
     # calculate the similarity matrix
-    benchmarks_embeds = await gemini_embedding_async(api_key, model_name, benchmarks, n_concurrent)
-    candidates_embeds = await gemini_embedding_async(api_key, model_name, candidates, n_concurrent)
-    # benchmarks_embeds = await ollama_embedding(model_name, benchmarks)
-    # candidates_embeds = await ollama_embedding(model_name, candidates)
-    similarity_matrix = semantic_similarity_matrix(benchmarks_embeds, candidates_embeds)
-    similarity_matrix = np.array(similarity_matrix)
-
-    filtered_candidates, match_results = [], []
-    _, num_cols = similarity_matrix.shape
-    for j in range(num_cols):
-        column = similarity_matrix[:, j]
-        # find values and corresponding positions given threshold
-        above_threshold_indices = np.where(column > threshold)[0]
-        above_threshold_values = column[above_threshold_indices]
-
-        if len(above_threshold_values) == 0:  # skip 
-            continue
-        sorted_indices = np.argsort(above_threshold_values)[::-1]  # desceding order
-        selected_indices = sorted_indices[:3]
-
-        matched_info = []
-        for i in selected_indices:
-          row_index = above_threshold_indices[i]
-          similarity = above_threshold_values[i]
-          matched_info.append({"row_index": row_index, "similarity": similarity.item()})
-        opt = {"candidate_index": j, "matched_info": matched_info}
-        match_results.append(opt)
-        filtered_candidates.append(candidates[j])
-    return filtered_candidates[0:top_k], match_results[0:top_k]
\ No newline at end of file
+    # embed benchmarks and candidates in one call, so short keyword lists share requests with abstracts
+    embeds = await cached_embedding_async(
+        embed_fn, model_name, benchmarks + candidates, cache, api_key=api_key, n_concurrent=n_concurrent)
+    benchmarks_embeds, candidates_embeds = embeds[:len(benchmarks)], embeds[len(benchmarks):]
+    if store is not None and candidate_ids is not None:
+        keep = [i for i, x in enumerate(candidate_ids) if x is not None]
+        if keep:
+            store.append([candidate_ids[i] for i in keep], np.asarray(candidates_embeds)[keep])
+    if quantized:
+        codes, scales = quantize_int8(candidates_embeds)
+        match_results = select_top_matches_int8(
+            benchmarks_embeds, codes, scales, candidates_embeds, threshold, top_k, block_cols)
+    else:
+        similarity_blocks = cosine_similarity_blocks(benchmarks_embeds, candidates_embeds, block_cols)
+        match_results = select_top_matches(similarity_blocks, threshold, top_k)
+    filtered_candidates = [candidates[x["candidate_index"]] for x in match_results]
+    return filtered_candidates, match_results
+
+async def filter_stored_by_topics(
+        api_key,
+        model_name,
+        benchmarks: List[str],
+        store: EmbeddingStore,
+        threshold: Optional[float] = 0.7,
+        top_k: Optional[int] = 10,
+        n_concurrent: Optional[int] = 5,
+        cache: Optional[EmbeddingCache] = None,
+        block_rows: Optional[int] = 65536,
+        index: Optional[IVFIndex] = None,
+        embed_fn = gemini_embedding_async,
+        quantized: bool = False):
+    """match all papers in the embedding store to benchmarks, without re-embedding them
+    Args:
+        benchmarks: a list of keywords, titles, or abstracts of existing papers (e.g. a new interest profile)
+        store: embedding store of papers embedded with the same model
+        block_rows: rows of the store to score at a time, bounds memory use
+        top_k: candidates to keep, None keeps every match
+        index: optional ANN index over the store, if given only the benchmarks' approximate top_k neighbours
+            are scored instead of the whole store (matched_info then only lists benchmarks the candidate is a neighbour of)
+        embed_fn: embedding backend, the same one the store was filled with
+        quantized: scan the store's int8 copy and re-score only the shortlist in full precision
+    Returns:
+        list of matched paper identifiers, best match first
+        list of matching information, with store row and identifier of each candidate
+    """
+    benchmarks_embeds = await cached_embedding_async(
+        embed_fn, model_name, benchmarks, cache, api_key=api_key, n_concurrent=n_concurrent)
+    benchmarks_embeds = normalize_embeddings(benchmarks_embeds)
+
+    if index is not None:
+        index.sync()
+        matches = {}  # row -> [(similarity, benchmark index)]
+        embedded = np.flatnonzero(np.isfinite(benchmarks_embeds).all(axis=1))
+        for i, neighbours in zip(embedded, index.search(benchmarks_embeds[embedded], k=top_k, threshold=threshold)):
+            for row, similarity in neighbours:
+                matches.setdefault(row, []).append((similarity, i))
+        candidates = []
+        for row, pairs in matches.items():
+            pairs = sorted(pairs, reverse=True)[:3]
+            matched_info = [{"row_index": int(i), "similarity": similarity} for similarity, i in pairs]
+            candidates.append((pairs[0][0], row, matched_info))
+        candidates = sorted(candidates, key=lambda x: x[0], reverse=True)[:top_k]
+    else:
+        if quantized:
+            codes, scales = store.quantized(block_rows)
+            selected = select_top_matches_int8(
+                benchmarks_embeds, codes, scales, store.matrix(), threshold, top_k, block_rows)
+        else:
+            selected = select_top_matches(
+                cosine_similarity_blocks(benchmarks_embeds, store.matrix(), block_rows), threshold, top_k)
+        candidates = [(x["matched_info"][0]["similarity"], x["candidate_index"], x["matched_info"]) for x in selected]
+
+    identifiers = store.identifiers_for([row for _, row, _ in candidates])
+    match_results = [{"candidate_index": row, "identifier": identifier, "matched_info": matched_info}
+                     for (_, row, matched_info), identifier in zip(candidates, identifiers)]
+    return identifiers, match_results
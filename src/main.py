@@ -10,8 +10,12 @@ from config import CONFIG
 from dly_preprint_papers import PapersPreprint
 from dly_discussed_papers import PapersDiscussed
 from dly_recommended_papers import PapersRecommended
-from database.sqlite_interface import df_to_sqlite
+from database.sqlite_interface import df_to_sqlite, get_oai_watermarks, update_oai_watermarks, update_paper_categories
+from database.sqlite_store import SQLiteStore
+from database.paper_records import OAIPaper, DailyPaper, records_to_frame
 from filter_and_ranking import filter_by_topics
+from models.embed_cache import EmbeddingCache
+from models.embed_store import EmbeddingStore
 
 def gen_proxy_list(timeout=5, google_enable=False, anonym=False, filtered=False, https=False):
     return FreeProxy(
@@ -38,12 +42,20 @@ def deduplicate_list_of_dicts(data, key):
 
 async def get_dly_papers():
     """get daily preprint papers on specific domain and save to database
+    Only papers newer than the highest OAI datestamp already harvested per domain are requested,
+    so missed days are caught up and repeated runs download nothing twice.
     """
+    db_name = os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['DB_NAME'])
     oai = PapersPreprint(data_path = CONFIG['DATABASE']['DB_PATH'])
+    store = SQLiteStore(db_name)
+    watermarks = get_oai_watermarks(
+        store,
+        watermark_table = CONFIG['DATABASE']['OAI_WATERMARK_TBL_NM'],
+        paper_table = CONFIG['DATABASE']['OAI_PAPER_TBL_NM'])
     # get daily preprint papers of specific 
     preprint_papers_metadata = await oai.pull_arxiv_metadata(
         domains = CONFIG['ARXIV']['DOMAIN'],
-        from_date = CONFIG['TIME']['YESTERDAY'],
+        from_date = oai.harvest_from_dates(CONFIG['ARXIV']['DOMAIN'], watermarks, CONFIG['TIME']['YESTERDAY']),
         until_date = CONFIG['TIME']['CURRENT_DT'])
     
     # filter by restrict categories
@@ -53,14 +65,29 @@ async def get_dly_papers():
     
     # save data to database
     filtered_papers_metadata = deduplicate_list_of_dicts(filtered_papers_metadata, CONFIG['DATABASE']['OAI_PAPER_TBL_KEY'])
-    df = pd.DataFrame(filtered_papers_metadata)
+    df = records_to_frame(filtered_papers_metadata, OAIPaper)
     df['insert_dt'] = CONFIG['TIME']['CURRENT_DT']
-    df_to_sqlite(
-        df, 
-        table_name = CONFIG['DATABASE']['OAI_PAPER_TBL_NM'], 
-        db_name = os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['DB_NAME']),
-        if_exists = 'append', 
-        id_key = CONFIG['DATABASE']['OAI_PAPER_TBL_KEY'])
+    # papers and watermarks are committed in one transaction, the watermarks move only once the papers are safely stored
+    with store.transaction():
+        saved = df_to_sqlite(
+            df, 
+            table_name = CONFIG['DATABASE']['OAI_PAPER_TBL_NM'], 
+            db_name = store,
+            if_exists = 'append', 
+            id_key = CONFIG['DATABASE']['OAI_PAPER_TBL_KEY'],
+            indexes = CONFIG['DATABASE']['OAI_PAPER_TBL_INDEXES'],
+            fts_columns = CONFIG['DATABASE']['OAI_PAPER_TBL_FTS'])
+        if saved:
+            saved = update_paper_categories(
+                store,
+                category_table = CONFIG['DATABASE']['OAI_CATEGORY_TBL_NM'],
+                paper_ids = df[CONFIG['DATABASE']['OAI_PAPER_TBL_KEY']].tolist(),
+                categories = [paper.get('categories') for paper in filtered_papers_metadata],
+                paper_table = CONFIG['DATABASE']['OAI_PAPER_TBL_NM'],
+                id_key = CONFIG['DATABASE']['OAI_PAPER_TBL_KEY'])
+        if saved:
+            update_oai_watermarks(store, CONFIG['DATABASE']['OAI_WATERMARK_TBL_NM'], oai.latest_datestamps)
+    store.close()
     return filtered_papers_metadata
 
 def get_trending_papers():
@@ -71,6 +98,7 @@ def get_trending_papers():
     hf_papers_metadata = rec.get_huggingface_daily_papers()
 
     # get discussed papers from twitter
+    store = SQLiteStore(os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['DB_NAME']))
     try:
         http_proxies = gen_proxy_list()
         tw = PapersDiscussed()
@@ -84,7 +112,7 @@ def get_trending_papers():
         df_to_sqlite(
             df_tw_accts, 
             table_name = CONFIG['DATABASE']['TW_ACCT_TBL_NM'], 
-            db_name = os.path.join(CONFIG['DATABASE']['DB_PATH'],  CONFIG['DATABASE']['DB_NAME']),
+            db_name = store,
             if_exists = 'append', 
             id_key = CONFIG['DATABASE']['TW_ACCT_TBL_KEY'])
         
@@ -95,7 +123,7 @@ def get_trending_papers():
         df_to_sqlite(
             df_tw_tweets, 
             table_name = CONFIG['DATABASE']['TW_TWEET_TBL_NM'], 
-            db_name = os.path.join(CONFIG['DATABASE']['DB_PATH'],  CONFIG['DATABASE']['DB_NAME']),
+            db_name = store,
             if_exists = 'append', 
             id_key = CONFIG['DATABASE']['TW_TWEET_TBL_KEY'])
         
@@ -110,13 +138,16 @@ def get_trending_papers():
     recommended_papers_metadata = hf_papers_metadata + github_papers_metadata + tweet_paper_metadata
     
     # save all papers
-    df_papers = pd.DataFrame(recommended_papers_metadata)
+    df_papers = records_to_frame(recommended_papers_metadata, DailyPaper)
     df_papers['insert_dt'] = CONFIG['TIME']['CURRENT_DT']
     df_to_sqlite(
         df_papers, 
         table_name = CONFIG['DATABASE']['DAILY_PAPER_TBL_NM'], 
-        db_name = os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['DB_NAME']),
-        if_exists = 'append')
+        db_name = store,
+        if_exists = 'append',
+        indexes = CONFIG['DATABASE']['DAILY_PAPER_TBL_INDEXES'],
+        fts_columns = CONFIG['DATABASE']['DAILY_PAPER_TBL_FTS'])
+    store.close()
     return recommended_papers_metadata
 
 
@@ -159,13 +190,27 @@ async def run_trending_papers(
     rec_papers_titles = [x.get('title') for x in recommended_papers_metadata]
     
     # match daily papers with keywords & zotero papers
-    matched_dlypapers_metadata, match_relationships = await filter_by_topics(
-        api_key = api_key,
-        model_name = model_name,
-        benchmarks = zot_abstracts + keywords,
-        candidates = dly_papers_abstracts + rec_papers_abstracts,
-        threshold=0.70,
-        n_concurrent=5)
+    embed_cache = EmbeddingCache(
+        os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['EMBED_CACHE_DB_NAME']),
+        max_entries = CONFIG['DATABASE']['EMBED_CACHE_MAX_ENTRIES'])
+    embed_store = EmbeddingStore(
+        os.path.join(CONFIG['DATABASE']['DB_PATH'], CONFIG['DATABASE']['EMBED_STORE_DIR']),
+        model_name = model_name)
+    try:
+        matched_dlypapers_metadata, match_relationships = await filter_by_topics(
+            api_key = api_key,
+            model_name = model_name,
+            benchmarks = zot_abstracts + keywords,
+            candidates = dly_papers_abstracts + rec_papers_abstracts,
+            threshold=0.70,
+            n_concurrent=5,
+            cache=embed_cache,
+            store=embed_store,
+            candidate_ids=[x.get(CONFIG['DATABASE']['OAI_PAPER_TBL_KEY']) for x in dly_papers_metadata]
+                          + [None] * len(recommended_papers_metadata))
+    finally:
+        embed_cache.close()
+        embed_store.close()
     
     # message showing matching logic
     for idx, item in enumerate(match_relationships):
@@ -0,0 +1,155 @@
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+
+from models.embed_store import EmbeddingStore
+from models.similarity import normalize_embeddings
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """k-means on normalized vectors with cosine similarity, return normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=n_clusters) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]  # reseed empty clusters
+        centroids = normalize_embeddings(sums)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, store: EmbeddingStore, n_lists: int = 256, n_probe: int = 16, seed: int = 0):
+        """Inverted-file (IVF) approximate nearest-neighbour index over the rows of an embedding store.
+        Args:
+            store: embedding store holding the vectors, the index only keeps row numbers per list.
+            n_lists: number of clusters (inverted lists), about sqrt(n_rows) is a good start.
+            n_probe: lists scanned per query, the higher the better recall and the slower the query.
+            seed: random seed of clustering.
+        Note:
+            - Clusters are trained by spherical k-means on normalized embeddings, once the store has enough rows.
+              Until then queries fall back to an exact scan.
+            - sync() indexes rows appended to the store since the last sync, so the index grows with the pool
+              without rebuilding. Call rebuild() to re-train clusters once the pool has drifted a lot.
+            - The index is saved next to the store as `{model}.ivf.npz`.
+        """
+        self.store = store
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.index_path = os.path.splitext(store.matrix_path)[0] + '.ivf.npz'
+        self.centroids = None
+        self.lists: List[List[np.ndarray]] = [[] for _ in range(n_lists)]
+        self.n_indexed = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        data = np.load(self.index_path)
+        if data['centroids'].shape[0] != self.n_lists or int(data['n_indexed']) > len(self.store):
+            logger.warning(f"ANN index {self.index_path} does not match the store, it will be rebuilt.")
+            return
+        self.centroids = data['centroids']
+        offsets, rows = data['offsets'], data['rows']
+        self.lists = [[rows[offsets[i]:offsets[i + 1]]] for i in range(self.n_lists)]
+        self.n_indexed = int(data['n_indexed'])
+
+    def save(self):
+        if self.centroids is None:
+            return
+        lists = [np.concatenate(x) if x else np.empty(0, dtype=np.int64) for x in self.lists]
+        offsets = np.concatenate([[0], np.cumsum([len(x) for x in lists])])
+        tmp_path = self.index_path + '.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, rows=np.concatenate(lists).astype(np.int64),
+                 offsets=offsets, n_indexed=self.n_indexed)
+        os.replace(tmp_path, self.index_path)
+
+    def _train(self, max_samples: int = 100000):
+        rng = np.random.default_rng(self.seed)
+        n_rows = len(self.store)
+        sample_rows = np.sort(rng.choice(n_rows, min(n_rows, max_samples), replace=False))
+        sample = normalize_embeddings(self.store.matrix()[sample_rows])
+        self.centroids = spherical_kmeans(sample, self.n_lists, seed=self.seed)
+        self.lists = [[] for _ in range(self.n_lists)]
+        self.n_indexed = 0
+
+    def sync(self, block_rows: int = 65536) -> int:
+        """index rows appended to the store since last sync, return number of rows added"""
+        n_rows = len(self.store)
+        if self.centroids is None:
+            if n_rows < self.n_lists * 8:  # too few rows to cluster, keep scanning exactly
+                return 0
+            self._train()
+        matrix = self.store.matrix()
+        added = 0
+        for start in range(self.n_indexed, n_rows, block_rows):
+            block = normalize_embeddings(matrix[start:min(start + block_rows, n_rows)])
+            assignment = np.argmax(block @ self.centroids.T, axis=1)
+            order = np.argsort(assignment, kind='stable')
+            bounds = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+            for i in range(self.n_lists):
+                if bounds[i] < bounds[i + 1]:
+                    self.lists[i].append(start + order[bounds[i]:bounds[i + 1]])
+            added += len(block)
+        self.n_indexed = n_rows
+        if added:
+            self.save()
+        return added
+
+    def rebuild(self):
+        """re-train clusters on the current pool and index all rows again"""
+        self.centroids = None
+        self.sync()
+
+    def search(self, queries: np.ndarray, k: Optional[int] = 10, threshold: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+        """top-k store rows by cosine similarity for each query
+        Args:
+            queries: (n_queries, dim) embeddings
+            k: max candidates per query, None for every candidate above threshold
+            threshold: keep only candidates with similarity above it
+        Returns:
+            for each query, list of (row, similarity), best first
+        """
+        queries = normalize_embeddings(np.atleast_2d(queries))
+        if self.centroids is None:
+            return self._exact_search(queries, k, threshold)
+
+        probe = min(self.n_probe, self.n_lists)
+        nearest_lists = np.argpartition(-(queries @ self.centroids.T), probe - 1, axis=1)[:, :probe]
+        matrix = self.store.matrix()
+        results = []
+        for query, lists in zip(queries, nearest_lists):
+            parts = [part for i in lists for part in self.lists[i]]
+            if not parts:
+                results.append([])
+                continue
+            rows = np.sort(np.concatenate(parts))  # sorted rows read the memmap in file order
+            results.append(_top_k(rows, normalize_embeddings(matrix[rows]) @ query, k, threshold))
+        return results
+
+    def _exact_search(self, queries, k, threshold):
+        candidates: List[List[Tuple[int, float]]] = [[] for _ in range(len(queries))]
+        for start, block in self.store.iter_blocks():
+            similarity = normalize_embeddings(block) @ queries.T
+            rows = np.arange(start, start + len(block))
+            for q in range(len(queries)):
+                candidates[q] = sorted(candidates[q] + _top_k(rows, similarity[:, q], k, threshold),
+                                       key=lambda x: x[1], reverse=True)[:k]
+        return candidates
+
+
+def _top_k(rows: np.ndarray, similarity: np.ndarray, k: Optional[int], threshold: Optional[float]) -> List[Tuple[int, float]]:
+    if threshold is not None:
+        keep = similarity > threshold
+        rows, similarity = rows[keep], similarity[keep]
+    if k is not None and len(similarity) > k:
+        top = np.argpartition(-similarity, k - 1)[:k]
+        rows, similarity = rows[top], similarity[top]
+    order = np.argsort(-similarity)
+    return [(int(rows[i]), float(similarity[i])) for i in order]
@@ -1,25 +1,82 @@
-import math
 import time
 import asyncio
+import threading
 import numpy as np
-from typing import List
-from sentence_transformers import util  # pip install sentence-transformers https://github.com/UKPLab/sentence-transformers
+from typing import Dict, List, Optional
 
-import ollama  # pip install ollama
 from google import genai  # pip install google-genai https://github.com/googleapis/python-genai
 from google.genai import types  
 
+from config import CONFIG
+from models.embed_batching import estimate_tokens, plan_embedding_batches, truncate_to_tokens
+from models.local_embedding import local_embedding_async
+from models.similarity import cosine_similarity_matrix
+from tools.rate_governor import TokenBucketLimiter, get_quota_limiter, parse_retry_after
+
+_genai_clients: Dict[str, genai.Client] = {}
+_genai_clients_lock = threading.Lock()
+
+def get_genai_client(api_key) -> genai.Client:
+    """genai client shared by all calls with the same api key, instead of one client per batch"""
+    with _genai_clients_lock:
+        client = _genai_clients.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            _genai_clients[api_key] = client
+        return client
+
+def get_embedding_limiter(model_name) -> TokenBucketLimiter:
+    """quota limiter shared by all embedding calls of a model"""
+    return get_quota_limiter(f"gemini-embedding|{model_name}",
+                             CONFIG['EMBED']['EMBEDDING_RPM'], CONFIG['EMBED']['EMBEDDING_TPM'])
+
+def plan_gemini_batches(texts: List[str]) -> List[List[str]]:
+    """truncate texts to the model's token limit and pack them into requests within CONFIG['EMBED'] limits"""
+    max_text_tokens = CONFIG['EMBED']['EMBEDDING_MODEL_MAX_TOKENS']
+    texts = [truncate_to_tokens(text, max_text_tokens) for text in texts]
+    batches = plan_embedding_batches(
+        texts, max_text_tokens,
+        max_request_tokens=CONFIG['EMBED']['EMBEDDING_REQUEST_MAX_TOKENS'],
+        max_request_texts=CONFIG['EMBED']['EMBEDDING_REQUEST_MAX_TEXTS'],
+        tokens_per_minute=CONFIG['EMBED']['EMBEDDING_TPM'])
+    return [[texts[i] for i in batch] for batch in batches]
+
+def _rate_limit_delay(error: Exception) -> Optional[float]:
+    """Retry-After in seconds (0 if not given) if error is a 429 response, else None"""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if code != 429:
+        return None
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    return parse_retry_after(headers.get('Retry-After'), default=0)
+
+_SIZE_ERROR_HINTS = ('token', 'too long', 'too large', 'exceed', 'payload', 'size')
+
+def _error_kind(error: Exception) -> str:
+    """how to recover from a failed embedding request:
+    'transient' (429, 5xx, timeouts, connection errors) is retried, 'size' (request or text too large) is bisected,
+    'permanent' (invalid key, 401 / 403, malformed request) is raised at once, retrying it only burns quota
+    """
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if not isinstance(code, int):
+        return 'transient'
+    if code in (408, 429) or code >= 500:
+        return 'transient'
+    if code == 413:
+        return 'size'
+    if code == 400:
+        message = str(getattr(error, 'message', None) or error).lower()
+        if any(hint in message for hint in _SIZE_ERROR_HINTS):
+            return 'size'
+    return 'permanent' if 400 <= code < 500 else 'transient'
+
 
 async def ollama_embedding(model, texts :list[str]) -> np.ndarray:
-    embed_text = []
-    for text in texts:
-      data = ollama.embeddings(model=model, prompt=text)
-      embed_text.append(data["embedding"])
-    return embed_text
+    """local ollama embedding, texts are sent in concurrent batches"""
+    return await local_embedding_async(None, model, texts)
 
 def gemini_llm(api_key, model_name, qa_prompt, sys_prompt=None, temperature=0.3):
     """gemini llm generation"""
-    client = genai.Client(api_key=api_key)
+    client = get_genai_client(api_key)
     config = types.GenerateContentConfig(
         system_instruction=sys_prompt,
         temperature=temperature)
@@ -29,60 +86,137 @@ def gemini_llm(api_key, model_name, qa_prompt, sys_prompt=None, temperature=0.3)
         config=config)
     return response.text
 
-def gemini_embedding_sync(api_key, model_name, texts: List[str]) -> np.ndarray:
-    """gemeni text embedding"""
-    client = genai.Client(api_key=api_key)
-    n = math.ceil(len(texts) / 100)
+def _embed_batch_sync(client, limiter, model_name, texts_btch, max_retries: int = 5) -> list:
+    """embed one batch, waiting on the quota limiter and retrying 429s"""
+    for attempt in range(max_retries + 1):
+        limiter.wait(sum(estimate_tokens(text) for text in texts_btch))
+        try:
+            btch_result = client.models.embed_content(
+                model=model_name,  # "models/text-embedding-004",
+                contents=texts_btch)
+            break
+        except Exception as e:
+            retry_after = _rate_limit_delay(e)
+            if retry_after is None or attempt == max_retries:
+                raise
+            limiter.on_rate_limited(retry_after or None)
+    limiter.on_success()
+    embeddings = [item['values'] for item in btch_result.to_json_dict()['embeddings']]
+    if len(embeddings) != len(texts_btch):
+        raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts_btch)} texts.")
+    return embeddings
 
+def _recovering_batch_sync(client, limiter, model_name, texts_btch, max_retries: int = 2, backoff: float = 1.0) -> list:
+    """embed one batch, retry it with backoff, then bisect it down to single texts; None for texts that keep failing
+    Errors that no retry can fix (see _error_kind) are raised at once, size errors are bisected without retrying.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return _embed_batch_sync(client, limiter, model_name, texts_btch)
+        except Exception as e:
+            error, kind = e, _error_kind(e)
+            if kind == 'permanent':
+                raise
+            if kind == 'size':
+                break
+            if attempt < max_retries:
+                time.sleep(backoff * 2 ** attempt)
+    if len(texts_btch) == 1:
+        print(f"Unable to embed text after {max_retries + 1} attempts: {error}")
+        return [None]
+    mid = len(texts_btch) // 2
+    return (_recovering_batch_sync(client, limiter, model_name, texts_btch[:mid], max_retries, backoff)
+            + _recovering_batch_sync(client, limiter, model_name, texts_btch[mid:], max_retries, backoff))
+
+def _stack_embeddings(embeddings: list) -> np.ndarray:
+    """stack embeddings into a float32 array, texts that could not be embedded get a row of NaN"""
+    dim = next((len(x) for x in embeddings if x is not None), None)
+    if dim is None and embeddings:
+        raise RuntimeError(f"None of {len(embeddings)} texts could be embedded.")
+    result = np.full((len(embeddings), dim or 0), np.nan, dtype=np.float32)
+    for i, vector in enumerate(embeddings):
+        if vector is not None:
+            result[i] = vector
+    n_failed = sum(x is None for x in embeddings)
+    if n_failed:
+        print(f"{n_failed} of {len(embeddings)} texts could not be embedded, their rows are NaN.")
+    return result
+
+def gemini_embedding_sync(api_key, model_name, texts: List[str]) -> np.ndarray:
+    """gemeni text embedding, aligned with texts (rows of NaN for texts that could not be embedded)"""
+    client = get_genai_client(api_key)
+    limiter = get_embedding_limiter(model_name)
     embeddings = []
-    for i in range(n):
-        texts_btch = texts[i*100: i*100+100]
-        btch_result = client.models.embed_content(
-            model=model_name,  # "models/text-embedding-004",
-            contents=texts_btch)
-        btch_embeddings = btch_result.to_json_dict()['embeddings']
-        embeddings.extend([item['values'] for item in btch_embeddings])
-        time.sleep(5)
-    return np.array(embeddings)
+    for texts_btch in plan_gemini_batches(texts):
+        embeddings.extend(_recovering_batch_sync(client, limiter, model_name, texts_btch))
+    return _stack_embeddings(embeddings)
 
-async def _batch_embedding_async(api_key, model_name, texts_btch, semaphore):
-    """异步处理单个批次的文本嵌入 (使用 asyncio.to_thread 包装同步调用)"""
+async def _batch_embedding_async(api_key, model_name, texts_btch, semaphore, max_retries: int = 5):
+    """异步处理单个批次的文本嵌入 (使用 run_in_executor 包装同步调用), 速率由共享的 token bucket 限制"""
     async with semaphore: # 获取信号量，限制并发数
-        client = genai.Client(api_key=api_key)
+        client = get_genai_client(api_key)
+        limiter = get_embedding_limiter(model_name)
         loop = asyncio.get_running_loop() # 获取当前事件循环
-        btch_result = await loop.run_in_executor(None, # 使用默认的 ThreadPoolExecutor
-                                                lambda: client.models.embed_content( # lambda 包装同步调用
-                                                    model=model_name,
-                                                    contents=texts_btch))
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(sum(estimate_tokens(text) for text in texts_btch))
+            try:
+                btch_result = await loop.run_in_executor(None, # 使用默认的 ThreadPoolExecutor
+                                                        lambda: client.models.embed_content( # lambda 包装同步调用
+                                                            model=model_name,
+                                                            contents=texts_btch))
+                break
+            except Exception as e:
+                retry_after = _rate_limit_delay(e)
+                if retry_after is None or attempt == max_retries:  # 非 429 错误或重试次数用尽
+                    raise
+                limiter.on_rate_limited(retry_after or None)
+        limiter.on_success()
         btch_embeddings = btch_result.to_json_dict()['embeddings']
         embeddings = [item['values'] for item in btch_embeddings]
-        await asyncio.sleep(5) # 异步 sleep，不阻塞线程
+        if len(embeddings) != len(texts_btch):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts_btch)} texts.")
         return embeddings
 
+async def _recovering_batch_async(api_key, model_name, texts_btch, semaphore, max_retries: int = 2, backoff: float = 1.0):
+    """失败的批次先退避重试, 再二分直到单条文本; 仍然失败的文本返回 None, 保证结果与输入对齐
+    无法通过重试恢复的错误 (如 API key 无效, 401 / 403, 请求格式错误) 直接抛出; 请求过大的错误不重试, 直接二分"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await _batch_embedding_async(api_key, model_name, texts_btch, semaphore)
+        except Exception as e:
+            error, kind = e, _error_kind(e)
+            if kind == 'permanent':
+                raise
+            if kind == 'size':
+                break
+            if attempt < max_retries:
+                await asyncio.sleep(backoff * 2 ** attempt) # 退避时不占用信号量
+    if len(texts_btch) == 1:
+        print(f"Unable to embed text after {max_retries + 1} attempts: {error}")
+        return [None]
+    mid = len(texts_btch) // 2
+    halves = await asyncio.gather(
+        _recovering_batch_async(api_key, model_name, texts_btch[:mid], semaphore, max_retries, backoff),
+        _recovering_batch_async(api_key, model_name, texts_btch[mid:], semaphore, max_retries, backoff))
+    return halves[0] + halves[1]
+
 async def gemini_embedding_async(api_key, model_name, texts: List[str], n_concurrent: int) -> np.ndarray:
-    """并发执行的 gemini 文本嵌入"""
-    n = math.ceil(len(texts) / 100)
+    """并发执行的 gemini 文本嵌入, 结果与 texts 一一对齐 (无法嵌入的文本对应一行 NaN)"""
     semaphore = asyncio.Semaphore(n_concurrent) # 创建信号量，限制并发数
     tasks = []
-    all_embeddings = []
-
-    for i in range(n):
-        texts_btch = texts[i*100: i*100+100]
-        task = asyncio.create_task(_batch_embedding_async(api_key, model_name, texts_btch, semaphore))
+    for texts_btch in plan_gemini_batches(texts): # 按估算 token 数打包请求
+        task = asyncio.create_task(_recovering_batch_async(api_key, model_name, texts_btch, semaphore))
         tasks.append(task)
 
-    results = await asyncio.gather(*tasks, return_exceptions=True) # 并发执行所有任务，并捕获异常
-
-    for result in results:
-        if isinstance(result, Exception):
-            print(f"子任务发生异常: {result}") # 打印异常信息，可以根据需要进行更详细的错误处理
-            # 决定如何处理异常，例如：跳过当前批次，记录错误日志等
-        else:
-            all_embeddings.extend(result) # 汇总正常批次的结果
-
-    return np.array(all_embeddings)
+    try:
+        results = await asyncio.gather(*tasks) # 并发执行所有任务, 可恢复的异常已在批次内处理
+    except Exception:
+        for task in tasks: # 不可恢复的错误 (如 API key 无效): 取消其余批次, 不再消耗配额
+            task.cancel()
+        raise
+    return _stack_embeddings([vector for result in results for vector in result])
 
 def semantic_similarity_matrix(vec_x, vec_y):
+    """cosine similarity matrix of vec_x to vec_y as float32 numpy array"""
     # embeds = await ollama_embedding(text_lst)
-    cosine_scores = util.pytorch_cos_sim(vec_x, vec_y)  # 计算余弦相似度矩阵，仅计算上三角部分
-    return cosine_scores
\ No newline at end of file
+    return cosine_similarity_matrix(vec_x, vec_y)
\ No newline at end of file
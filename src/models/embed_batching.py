@@ -0,0 +1,44 @@
+from typing import List, Optional
+
+def estimate_tokens(text: str) -> int:
+    """rough token count of text, about 4 characters per token"""
+    return len(text or '') // 4 + 1
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """cut text to about max_tokens, at the last whitespace before the limit, the same way every time"""
+    text = text or ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(max_tokens - 1, 0) * 4
+    cut = text[:max_chars]
+    space = cut.rfind(' ')
+    return cut[:space] if space > max_chars // 2 else cut
+
+def plan_embedding_batches(
+        texts: List[str],
+        max_text_tokens: int,
+        max_request_tokens: int,
+        max_request_texts: int = 100,
+        tokens_per_minute: Optional[int] = None) -> List[List[int]]:
+    """pack texts into embedding requests by estimated tokens
+    Args:
+        texts: texts to embed, already truncated to max_text_tokens
+        max_text_tokens: token limit of one text
+        max_request_tokens: token limit of one request
+        max_request_texts: text limit of one request
+        tokens_per_minute: token quota per minute, no request may exceed it or it could never be sent
+    Returns:
+        list of batches, each a list of consecutive text indices, in order
+    """
+    budget = max_request_tokens if not tokens_per_minute else min(max_request_tokens, tokens_per_minute)
+    batches, batch, batch_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = min(estimate_tokens(text), max_text_tokens)
+        if batch and (len(batch) >= max_request_texts or batch_tokens + tokens > budget):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
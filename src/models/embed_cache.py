@@ -0,0 +1,116 @@
+import time
+import hashlib
+import sqlite3
+import numpy as np
+from typing import List, Optional
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """collapse whitespace, so that the same text with different line breaks / spaces hits the same entry"""
+    return ' '.join((text or '').split())
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        """Persistent content-addressed embedding cache, keyed by (model name, normalized text hash).
+        Args:
+            db_path (str): sqlite file to store the cache in.
+            max_entries (int): entries kept at most, the least recently used ones are evicted beyond that.
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)")
+        self.conn.commit()
+
+    def get_many(self, model_name: str, hashes: List[str], chunk_size: int = 500) -> dict:
+        """look up vectors by text hash, return dict of hash to float32 vector for the hits"""
+        hits = {}
+        hashes = list(dict.fromkeys(hashes))
+        for i in range(0, len(hashes), chunk_size):
+            chunk = hashes[i:i + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text_hash, dim, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                [model_name] + chunk).fetchall()
+            for hash_key, dim, vector in rows:
+                hits[hash_key] = np.frombuffer(vector, dtype=np.float32, count=dim)
+        if hits:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany("UPDATE embedding_cache SET last_used = ? WHERE model = ? AND text_hash = ?",
+                                      [(now, model_name, h) for h in hits])
+        return hits
+
+    def put_many(self, model_name: str, hashes: List[str], vectors: np.ndarray):
+        """store vectors by text hash, then evict least recently used entries beyond max_entries"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(model_name, h, vec.shape[0], vec.tobytes(), now) for h, vec in zip(hashes, vectors)])
+        self.evict()
+
+    def evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        if count > self.max_entries:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM embedding_cache WHERE rowid IN "
+                    "(SELECT rowid FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,))
+            logger.info(f"Evicted {count - self.max_entries} least recently used embeddings from cache.")
+
+    def close(self):
+        self.conn.close()
+
+
+async def cached_embedding_async(embed_fn, model_name: str, texts: List[str],
+                                 cache: Optional[EmbeddingCache] = None, **kwargs) -> np.ndarray:
+    """embed texts through cache, only texts missing from the cache are sent to the embedding backend
+    Args:
+        embed_fn: async embedding function with signature like gemini_embedding_async(api_key, model_name, texts, ...)
+        model_name: embedding model name, part of the cache key
+        texts: texts to embed
+        cache: embedding cache, if None every text is sent to the backend
+        kwargs: other arguments of embed_fn (e.g. api_key, n_concurrent)
+    Returns:
+        np.ndarray of float32 embeddings aligned with texts, rows of NaN for texts the backend failed on
+    """
+    if cache is None:
+        return np.asarray(await embed_fn(model_name=model_name, texts=texts, **kwargs), dtype=np.float32)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    hashes = [text_hash(text) for text in texts]
+    vectors = cache.get_many(model_name, hashes)
+
+    # send each distinct missing text once
+    missing = {}
+    for text, hash_key in zip(texts, hashes):
+        if hash_key not in vectors and hash_key not in missing:
+            missing[hash_key] = text
+    logger.info(f"Embedding cache: {len(texts) - sum(h in missing for h in hashes)} hits, {len(missing)} texts to embed.")
+
+    if missing:
+        missing_embeds = np.asarray(await embed_fn(model_name=model_name, texts=list(missing.values()), **kwargs), dtype=np.float32)
+        if len(missing_embeds) != len(missing):
+            raise RuntimeError(f"Embedding backend returned {len(missing_embeds)} vectors for {len(missing)} texts.")
+        # rows of NaN mark texts the backend failed on, they are returned as is but not cached
+        embedded = np.isfinite(missing_embeds).all(axis=1)
+        missing_keys = list(missing.keys())
+        cache.put_many(model_name, [k for k, ok in zip(missing_keys, embedded) if ok], missing_embeds[embedded])
+        vectors.update(zip(missing_keys, missing_embeds))
+
+    return np.vstack([vectors[hash_key] for hash_key in hashes])
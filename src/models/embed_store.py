@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.similarity import quantize_int8
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class EmbeddingStore:
+    def __init__(self, store_path: str, model_name: str, dim: Optional[int] = None):
+        """Persistent, append-only embedding store of one model, memory-mapped for reading.
+        Args:
+            store_path (str): folder of the store.
+            model_name (str): embedding model name, each model has its own matrix.
+            dim (int): embedding dimension, taken from the first append if not given.
+        Note:
+            - Vectors are kept as one float32 row-major matrix in `{model}.f32`, read through np.memmap,
+              so the whole pool never has to be loaded into RAM.
+            - `embedding_index.db` maps paper identifiers (e.g. `identifier` of oai_paper_pool) to row numbers.
+            - Rows are written to the matrix before they are indexed, so rows left by an interrupted append
+              are unreferenced and cut off on next open.
+            - quantized() keeps an int8 copy (`{model}.i8` + `{model}.scale.f32`), a quarter of the float32 size,
+              derived from the matrix and brought up to date on demand.
+        """
+        os.makedirs(store_path, exist_ok=True)
+        self.store_path = store_path
+        self.model_name = model_name
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.matrix_path = os.path.join(store_path, f"{safe_name}.f32")
+        self.codes_path = os.path.join(store_path, f"{safe_name}.i8")
+        self.scales_path = os.path.join(store_path, f"{safe_name}.scale.f32")
+        self.conn = sqlite3.connect(os.path.join(store_path, 'embedding_index.db'))
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS embedding_models (model TEXT PRIMARY KEY, dim INTEGER NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_rows (model TEXT NOT NULL, identifier TEXT NOT NULL, "
+                "row INTEGER NOT NULL, PRIMARY KEY (model, identifier))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_rows_row ON embedding_rows (model, row)")
+
+        row = self.conn.execute("SELECT dim FROM embedding_models WHERE model = ?", (model_name,)).fetchone()
+        self.dim = row[0] if row else dim
+        if row and dim is not None and dim != row[0]:
+            raise ValueError(f"Store of {model_name} has dim {row[0]}, got {dim}.")
+        self.n_rows = self.conn.execute("SELECT COUNT(*) FROM embedding_rows WHERE model = ?", (model_name,)).fetchone()[0]
+        self._repair()
+        self._memmap = None
+        self._quantized = None
+
+    def _repair(self):
+        """cut off rows of the matrix file (and its int8 copy) that never made it into the index"""
+        if self.dim is None:
+            return
+        for path, row_bytes in ((self.matrix_path, self.dim * 4), (self.codes_path, self.dim), (self.scales_path, 4)):
+            expected = self.n_rows * row_bytes
+            if os.path.exists(path) and os.path.getsize(path) > expected:
+                logger.warning(f"Cut off unindexed rows from {path}.")
+                os.truncate(path, expected)
+
+    def __len__(self):
+        return self.n_rows
+
+    def append(self, identifiers: List[str], vectors: np.ndarray) -> int:
+        """append vectors of new identifiers, identifiers already in the store are skipped
+        Returns:
+            number of rows appended
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(identifiers):
+            raise ValueError(f"Expect {len(identifiers)} vectors, got array of shape {vectors.shape}.")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO embedding_models (model, dim) VALUES (?, ?)", (self.model_name, self.dim))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Store of {self.model_name} has dim {self.dim}, got {vectors.shape[1]}.")
+
+        existing = self.rows_for(identifiers)
+        keep, seen = [], set()
+        for i, identifier in enumerate(identifiers):
+            if identifier is None or identifier in existing or identifier in seen or not np.isfinite(vectors[i]).all():
+                continue
+            seen.add(identifier)
+            keep.append(i)
+        if not keep:
+            return 0
+
+        with open(self.matrix_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors[keep]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO embedding_rows (model, identifier, row) VALUES (?, ?, ?)",
+                [(self.model_name, identifiers[i], self.n_rows + k) for k, i in enumerate(keep)])
+        self.n_rows += len(keep)
+        self._memmap = None  # remap to see the new rows
+        self._quantized = None
+        return len(keep)
+
+    def matrix(self) -> np.ndarray:
+        """memory-mapped (n_rows, dim) float32 matrix, read only"""
+        if self.n_rows == 0:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        if self._memmap is None:
+            self._memmap = np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(self.n_rows, self.dim))
+        return self._memmap
+
+    def quantized(self, block_rows: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """memory-mapped int8 codes (n_rows, dim) and scales (n_rows,) of the normalized matrix, read only"""
+        if self.n_rows == 0:
+            return np.empty((0, self.dim or 0), dtype=np.int8), np.empty(0, dtype=np.float32)
+        if self._quantized is None:
+            n_done = os.path.getsize(self.scales_path) // 4 if os.path.exists(self.scales_path) else 0
+            n_done = min(n_done, os.path.getsize(self.codes_path) // self.dim if os.path.exists(self.codes_path) else 0)
+            if n_done < self.n_rows:  # quantize rows appended since last time
+                matrix = self.matrix()
+                with open(self.codes_path, 'r+b' if n_done else 'wb') as codes_file, \
+                        open(self.scales_path, 'r+b' if n_done else 'wb') as scales_file:
+                    codes_file.truncate(n_done * self.dim)
+                    scales_file.truncate(n_done * 4)
+                    codes_file.seek(0, os.SEEK_END)
+                    scales_file.seek(0, os.SEEK_END)
+                    for start in range(n_done, self.n_rows, block_rows):
+                        codes, scales = quantize_int8(matrix[start:start + block_rows])
+                        codes_file.write(codes.tobytes())
+                        scales_file.write(scales.tobytes())
+            self._quantized = (np.memmap(self.codes_path, dtype=np.int8, mode='r', shape=(self.n_rows, self.dim)),
+                               np.memmap(self.scales_path, dtype=np.float32, mode='r', shape=(self.n_rows,)))
+        return self._quantized
+
+    def iter_blocks(self, block_rows: int = 65536) -> Iterator[Tuple[int, np.ndarray]]:
+        """iterate (start row, block of rows) over the matrix, one block in memory at a time"""
+        matrix = self.matrix()
+        for start in range(0, self.n_rows, block_rows):
+            yield start, np.asarray(matrix[start:start + block_rows])
+
+    def rows_for(self, identifiers: List[str], chunk_size: int = 500) -> Dict[str, int]:
+        """dict of identifier to row for identifiers in the store"""
+        keys = list(dict.fromkeys(x for x in identifiers if x is not None))
+        rows = {}
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.update(self.conn.execute(
+                f"SELECT identifier, row FROM embedding_rows WHERE model = ? AND identifier IN ({placeholders})",
+                [self.model_name] + chunk).fetchall())
+        return rows
+
+    def identifiers_for(self, rows: List[int], chunk_size: int = 500) -> List[Optional[str]]:
+        """identifiers of given rows, in the same order"""
+        mapping = {}
+        unique_rows = list(dict.fromkeys(int(x) for x in rows))
+        for i in range(0, len(unique_rows), chunk_size):
+            chunk = unique_rows[i:i + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            mapping.update((row, identifier) for identifier, row in self.conn.execute(
+                f"SELECT identifier, row FROM embedding_rows WHERE model = ? AND row IN ({placeholders})",
+                [self.model_name] + chunk).fetchall())
+        return [mapping.get(int(x)) for x in rows]
+
+    def get(self, identifiers: List[str]) -> Tuple[List[str], np.ndarray]:
+        """vectors of identifiers found in the store, returns (found identifiers, vectors)"""
+        rows = self.rows_for(identifiers)
+        found = [x for x in dict.fromkeys(identifiers) if x in rows]
+        if not found:
+            return [], np.empty((0, self.dim or 0), dtype=np.float32)
+        return found, np.asarray(self.matrix()[[rows[x] for x in found]])
+
+    def close(self):
+        self._memmap = None
+        self._quantized = None
+        self.conn.close()
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+
+from config import CONFIG
+
+_sessions: Dict[str, Tuple[requests.Session, int]] = {}
+_sessions_lock = threading.Lock()
+
+def get_http_session(base_url: str, pool_size: int = 16) -> requests.Session:
+    """http session shared by all calls to a server, keeping up to pool_size connections alive between batches"""
+    with _sessions_lock:
+        session, current_size = _sessions.get(base_url, (None, 0))
+        if session is None:
+            session = requests.Session()
+        if pool_size > current_size:
+            session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            _sessions[base_url] = (session, pool_size)
+        return session
+
+def _local_embed_batch(session: requests.Session, base_url: str, model_name: str, texts: List[str], timeout: float) -> list:
+    """embed one batch of texts with the Ollama `/api/embed` endpoint"""
+    response = session.post(f"{base_url.rstrip('/')}/api/embed",
+                            json={"model": model_name, "input": texts}, timeout=timeout)
+    response.raise_for_status()
+    embeddings = response.json()['embeddings']
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Embedding server returned {len(embeddings)} vectors for {len(texts)} texts.")
+    return embeddings
+
+async def local_embedding_async(api_key, model_name, texts: List[str], n_concurrent: int = 4,
+                                batch_size: int = 32, base_url: Optional[str] = None, timeout: float = 300) -> np.ndarray:
+    """batched, concurrent text embedding with a local embedding server (Ollama API), same interface as gemini_embedding_async
+    Args:
+        api_key: unused, kept for interface compatibility
+        model_name: model served locally, e.g. "snowflake-arctic-embed2:latest"
+        texts: texts to embed
+        n_concurrent: batches in flight at a time
+        batch_size: texts per request
+        base_url: server url, CONFIG['EMBED']['LOCAL_EMBEDDING_URL'] by default
+        timeout: seconds to wait for one batch
+    Returns:
+        (len(texts), dim) contiguous float32 array aligned with texts
+    """
+    base_url = base_url or CONFIG['EMBED']['LOCAL_EMBEDDING_URL']
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    session = get_http_session(base_url, pool_size=max(16, n_concurrent))
+    semaphore = asyncio.Semaphore(n_concurrent)
+    loop = asyncio.get_running_loop()
+
+    async def embed_batch(start):
+        async with semaphore:
+            batch = texts[start:start + batch_size]
+            embeddings = await loop.run_in_executor(
+                None, _local_embed_batch, session, base_url, model_name, batch, timeout)
+            return start, np.asarray(embeddings, dtype=np.float32)
+
+    results = await asyncio.gather(*[embed_batch(start) for start in range(0, len(texts), batch_size)])
+    dim = results[0][1].shape[1]
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    for start, batch_embeds in results:
+        embeddings[start:start + len(batch_embeds)] = batch_embeds
+    return embeddings
@@ -0,0 +1,70 @@
+import numpy as np
+from typing import Iterator, Tuple
+
+def normalize_embeddings(vectors, dtype=np.float32) -> np.ndarray:
+    """L2-normalize rows, so that cosine similarity becomes a plain dot product
+    Args:
+        vectors: (n, dim) embeddings
+        dtype: storage dtype of the result, np.float16 halves memory of large candidate sets
+    Returns:
+        (n, dim) normalized embeddings, zero rows stay zero
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(dtype, copy=False)
+
+def cosine_similarity_blocks(vec_x, vec_y, block_cols: int = 65536, normalized: bool = False) -> Iterator[Tuple[int, np.ndarray]]:
+    """cosine similarity of every x to every y, computed one block of y at a time
+    Args:
+        vec_x: (n_x, dim) embeddings, e.g. benchmarks
+        vec_y: (n_y, dim) embeddings, e.g. candidates, could be a memmap
+        block_cols: rows of vec_y per block, bounds the (n_x, block_cols) block in memory
+        normalized: whether inputs are already normalized (float32 or float16)
+    Yields:
+        (start, float32 similarity block of shape (n_x, block)), for y[start:start + block]
+    """
+    x = np.asarray(vec_x, dtype=np.float32) if normalized else normalize_embeddings(vec_x)
+    n_y = len(vec_y)
+    for start in range(0, n_y, block_cols):
+        y = vec_y[start:start + block_cols]
+        y = np.asarray(y, dtype=np.float32) if normalized else normalize_embeddings(y)  # float16 upcast per block
+        yield start, x @ y.T
+
+def cosine_similarity_matrix(vec_x, vec_y, block_cols: int = 65536, normalized: bool = False) -> np.ndarray:
+    """(n_x, n_y) float32 cosine similarity matrix, computed in blocks of vec_y"""
+    x = np.asarray(vec_x)
+    result = np.empty((len(x), len(vec_y)), dtype=np.float32)
+    for start, block in cosine_similarity_blocks(x, vec_y, block_cols, normalized):
+        result[:, start:start + block.shape[1]] = block
+    return result
+
+def quantize_int8(vectors, normalized: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """symmetric per-row int8 scalar quantization of (normalized) embeddings
+    Returns:
+        (n, dim) int8 codes and (n,) float32 scales, vector ~= codes * scale
+    """
+    vectors = np.asarray(vectors, dtype=np.float32) if normalized else normalize_embeddings(vectors)
+    failed = ~np.isfinite(vectors).all(axis=1)  # rows of texts that could not be embedded
+    if failed.any():
+        vectors = np.where(failed[:, None], 0, vectors)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    scales[failed] = np.nan  # keeps their similarity NaN, like the float path
+    return codes, scales.astype(np.float32)
+
+def int8_similarity_blocks(vec_x, codes, scales, block_cols: int = 65536) -> Iterator[Tuple[int, np.ndarray]]:
+    """approximate cosine similarity of every x to int8-quantized y, one block of y at a time
+    Args:
+        vec_x: (n_x, dim) embeddings, e.g. benchmarks
+        codes, scales: quantize_int8 output of y, could be memmaps
+    Yields:
+        (start, float32 similarity block of shape (n_x, block))
+    """
+    x = normalize_embeddings(vec_x)
+    for start in range(0, len(codes), block_cols):
+        block_codes = np.asarray(codes[start:start + block_cols], dtype=np.float32)
+        yield start, (x @ block_codes.T) * np.asarray(scales[start:start + block_cols])
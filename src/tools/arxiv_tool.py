@@ -1,6 +1,7 @@
 
 import arxiv # pip install arxiv (source from https://github.com/lukasschwab/arxiv.py)
 from sickle import Sickle # pip install sickle https://github.com/mloesch/sickle
+from sickle.oaiexceptions import BadResumptionToken, NoRecordsMatch
 
 import os
 import aiofiles
@@ -9,28 +10,47 @@ import aiofiles.ospath
 import pandas as pd
 from requests.exceptions import HTTPError, RequestException
 
+import time
+import queue
 import asyncio
-import xml.etree.ElementTree as ET
+import threading
 from typing import List, Dict, Optional
 
+from tools.oai_archive import HarvestArchive, ShardCompressor
+from tools.oai_checkpoint import HarvestCheckpoint
+from tools.oai_decoder import decode_oai_record, decode_oai_file
+from tools.rate_governor import get_host_governor, parse_retry_after
+
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-async def handle_http_error(e):
-    """Handle HTTP errors during metadata download."""
-    if e.response.status_code == 503:
-        retry_after = e.response.headers.get('Retry-After', 30)
-        logger.warning(f"HTTPError 503: Server busy. Retrying after {retry_after} seconds.")
-        await asyncio.sleep(int(retry_after))
-    else:
-        logger.error(f'HTTPError: Status code {e.response.status_code}')
-        raise e
+class GovernedSickle(Sickle):
+    def __init__(self, endpoint, governor, max_retries=5, **kwargs):
+        """Sickle client whose every HTTP request goes through a shared per-host rate governor.
+        Retry-After on 503 / 429 is honoured by holding back all requests to the host.
+        """
+        super().__init__(endpoint, **kwargs)
+        self.governor = governor
+        self.governed_retries = max_retries
+
+    def _request(self, kwargs):
+        for _ in range(self.governed_retries):
+            self.governor.wait()
+            http_response = super()._request(kwargs)
+            if http_response.status_code not in (429, 503):
+                return http_response
+            retry_after = parse_retry_after(http_response.headers.get('Retry-After'), self.default_retry_after)
+            self.governor.defer(retry_after)
+        self.governor.wait()
+        return super()._request(kwargs)  # let harvest raise on final failure
+
 
 class ArxivKit:   
-    def __init__(self, data_path):                 
+    def __init__(self, data_path, request_interval: float = 3.0):                 
         self.client = arxiv.Client(page_size= 100, delay_seconds=3.0, num_retries=3)
-        self.connection = Sickle('http://export.arxiv.org/oai2')
+        self.governor = get_host_governor('export.arxiv.org', request_interval)
+        self.connection = GovernedSickle('http://export.arxiv.org/oai2', self.governor)
         self.data_path = data_path
 
     def retrieve_metadata_by_paper(
@@ -74,60 +94,75 @@ class ArxivKit:
             arxiv_metadata.append(item.__dict__['_raw'])
         return arxiv_metadata
 
-    async def download_category_metadata(
+    def _list_records(
             self,
             category,
             from_date,
             until_date,
-            data_path):
-        """Download metadata from arXiv for specific category and date range in batch.
-        Args:
-            category (str): Specify paper category like "cs", "math", etc.
-                Reference to category could be found in http://export.arxiv.org/oai2?verb=ListSets
-                Only accept one category at a time.
-            from_date (str): The start date for the date range in ReactNative-MM-DD format.
-            until_date (str): The end date for the date range in ReactNative-MM-DD format.
-        Returns:
-            Downloaded xml file with arxiv metadata.
-        Note:
-            Function originated from jack-tol's [arXivGPT](https://github.com/jack-tol/arXivGPT/blob/main/metadata_pipeline.py).
-            With minor modification to: 1. specify paper category (the setSpec param); 2. save one record per line.
+            resumption_token: Optional[str] = None):
+        """start a ListRecords harvest, either from scratch or from a persisted resumptionToken
+        Returns None if no record matches (OAI noRecordsMatch).
         """
-        logger.info('Getting papers...')
+        if resumption_token is not None:
+            return self.connection.ListRecords(resumptionToken=resumption_token, ignore_deleted=True)
         params = {'metadataPrefix': 'arXiv',
                 'set': category,   # modification 1: add set para to specify paper category
                 'from': from_date,
                 'until': until_date,
                 'ignore_deleted': True}
-        data = self.connection.ListRecords(**params)
-        logger.info('Papers retrieved.')
+        try:
+            return self.connection.ListRecords(**params)
+        except NoRecordsMatch:
+            logger.info(f'No {category} records for the specified period, {from_date} - {until_date}.')
+            return None
 
-        iters = 0
-        errors = 0
+    def _drain_records(self, data, out_queue, stop, count: int, batch_size: int):
+        """Producer: drain the Sickle iterator into a bounded queue in batches (runs in a dedicated thread).
+        Each batch is a list of (page, raw). A final None marks the end, an exception instance marks a failure.
+        """
+        def put(item, final=False):
+            while not stop.is_set():
+                try:
+                    out_queue.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+            if final:  # the consumer is gone, still leave the terminal item for whoever reads the queue last
+                try:
+                    out_queue.put_nowait(item)
+                except queue.Full:
+                    pass
 
-        xml_file_nm = f"{category}_{from_date}_{until_date}.xml"
-        full_path = os.path.join(data_path, xml_file_nm)
-        async with aiofiles.open(full_path, 'a+', encoding="utf-8") as f:
-            while True:
+        iters = count
+        errors = 0
+        batch = []
+        try:
+            while not stop.is_set():
                 try:
-                    record = await asyncio.to_thread(lambda: next(data, None))
+                    token_before = data.resumption_token
+                    record = next(data, None)
                     if record is None:
-                        logger.info(f'{category} Metadata for the specified period, {from_date} - {until_date} downloaded.')
-                        # Check if the file is empty
-                        if os.stat(full_path).st_size == 0:
-                            logger.warning("No records found matching the criteria.")
-                            return None  # Or raise a custom exception: raise NoRecordsFoundError()
-                        return full_path  # Return full_path even if no records are found
-                    cleaned_record = record.raw.replace('\n', ' ').replace('\r', ' ')  # modification 2: replace multi-line text to one line
-                    await f.write(cleaned_record)
-                    await f.write('\n')
+                        break
+                    page = None
+                    if data.resumption_token is not token_before and token_before is not None:
+                        page = {'token': token_before.token, 'count': iters}
                     errors = 0
                     iters += 1
-                    if iters % 1000 == 0:
-                        logger.info(f'{iters} processing attempts made successfully.')
+                    if page is not None and batch:  # a page boundary always starts a new batch
+                        put(batch)
+                        batch = []
+                    batch.append((page, record.raw.replace('\n', ' ').replace('\r', ' ')))  # modification 2: replace multi-line text to one line
+                    if len(batch) >= batch_size:
+                        put(batch)
+                        batch = []
 
                 except HTTPError as e:
-                    await handle_http_error(e)
+                    if e.response is None or e.response.status_code not in (429, 503):
+                        logger.error(f'HTTPError: Status code {e.response.status_code if e.response is not None else None}')
+                        raise
+                    retry_after = parse_retry_after(e.response.headers.get('Retry-After'), 30)
+                    logger.warning(f"HTTPError {e.response.status_code}: Server busy. Retrying after {retry_after} seconds.")
+                    self.governor.defer(retry_after)
 
                 except RequestException as e:
                     logger.error(f'RequestException: {e}')
@@ -139,8 +174,254 @@ class ArxivKit:
                     if errors > 5:
                         logger.critical('Too many consecutive errors, stopping the harvester.')
                         raise
+            if batch:
+                put(batch)
+                batch = []
+            put(None, final=True)
+        except BaseException as e:  # hand any failure over, the consumer must never wait forever
+            if batch:  # records harvested before the failure are still delivered
+                put(batch)
+            put(e, final=True)
+
+    @staticmethod
+    def _take_batch(out_queue, stop, poll_interval: float = 0.5):
+        """Consumer side of the queue (runs in an executor thread): wait for the next batch,
+        but give up once stop is set, so a cancelled consumer never leaves a thread blocked on the queue.
+        """
+        while True:
+            try:
+                return out_queue.get(timeout=poll_interval)
+            except queue.Empty:
+                if stop.is_set():
+                    return None
+
+    async def _harvest_raw_records(
+            self,
+            data,
+            category,
+            from_date,
+            until_date,
+            count: int = 0,
+            batch_size: int = 500,
+            max_batches: int = 8):
+        """Iterate OAI records from a ListRecords harvest, yield batches of one-line raw xml.
+        Args:
+            data: Sickle ListRecords iterator.
+            category (str): Specify paper category like "cs", "math", etc.
+            from_date (str): The start date for the date range in YYYY-MM-DD format.
+            until_date (str): The end date for the date range in YYYY-MM-DD format.
+            count (int): records already harvested before this iterator (when resumed).
+            batch_size (int): max records per batch handed over by the producer thread.
+            max_batches (int): max batches buffered ahead of the consumer.
+        Yields:
+            list of (page, raw) tuples, where raw is the xml of one OAI record with line breaks removed,
+            and page is None except for the first record of a newly fetched page, for which it is
+            a dict of the resumptionToken that fetched the page and the count of records before the page.
+            A page boundary always starts a new batch.
+        Note:
+            A dedicated producer thread runs the blocking Sickle iterator, so the event loop only
+            pays one thread hop per batch instead of one per record.
+        """
+        out_queue = queue.Queue(maxsize=max_batches)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._drain_records, args=(data, out_queue, stop, count, batch_size),
+                                    name=f'oai-harvest-{category}', daemon=True)
+        producer.start()
+
+        iters = 0
+        start_time = time.monotonic()
+        next_log = 1000
+        try:
+            while True:
+                batch = await asyncio.to_thread(self._take_batch, out_queue, stop)
+                if batch is None:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                iters += len(batch)
+                if iters >= next_log:
+                    elapsed = time.monotonic() - start_time
+                    logger.info(f'{count + iters} records harvested ({iters / max(elapsed, 1e-6):.0f} records/s).')
+                    next_log = (iters // 1000 + 1) * 1000
+                yield batch
+        finally:
+            stop.set()
+        elapsed = time.monotonic() - start_time
+        logger.info(f'{category} Metadata for the specified period, {from_date} - {until_date} downloaded: '
+                    f'{iters} records in {elapsed:.1f}s ({iters / max(elapsed, 1e-6):.0f} records/s).')
+
+    async def _archived_raw_records(
+            self,
+            category,
+            from_date,
+            until_date,
+            archive_path,
+            replay: bool = True):
+        """Harvest raw records into a compressed archive shard, resuming from a persisted checkpoint if any.
+        Args:
+            category (str): Specify paper category like "cs", "math", etc.
+            from_date (str): The start date for the date range in YYYY-MM-DD format.
+            until_date (str): The end date for the date range in YYYY-MM-DD format.
+            archive_path (str): root folder of the archive, the manifest and the checkpoint store.
+            replay (bool): whether to yield records already archived (by an interrupted run, or a complete shard).
+        Yields:
+            list of raw xml of OAI records, each record exactly once.
+        Note:
+            A window already complete in the archive manifest is streamed from its shard, not downloaded again;
+            a window ending today or later is never complete, so a same-day re-run harvests it again.
+            Otherwise each OAI page is written as one gzip member, and the checkpoint is saved at every page boundary
+            after the shard is flushed. On resume the shard is truncated back to that boundary, and the harvest restarts
+            from the saved resumptionToken, so records of the interrupted page are neither lost nor duplicated.
+        """
+        archive = HarvestArchive(archive_path)
+        if await asyncio.to_thread(archive.is_complete, category, from_date, until_date):
+            logger.info(f'{category} Metadata for the specified period, {from_date} - {until_date} already archived.')
+            if replay:
+                for raw_records in archive.iter_raw_batches(category, from_date, until_date):
+                    yield raw_records
+            return
 
-    async def retrieve_metadata_by_category(self, category, from_date, until_date, data_path:Optional[str]=None):
+        full_path = archive.shard_path(category, from_date, until_date)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        checkpoints = HarvestCheckpoint(os.path.join(archive_path, 'oai_checkpoints.json'))
+
+        state = checkpoints.load(category, from_date, until_date)
+        if state is not None and (not os.path.exists(full_path) or os.path.getsize(full_path) < state['offset']):
+            logger.warning(f'Archive {full_path} does not match its checkpoint, harvest from scratch.')
+            state = None
+
+        logger.info('Getting papers...')
+        data = None
+        if state is not None:
+            try:
+                data = await asyncio.to_thread(self._list_records, category, from_date, until_date, state['token'])
+                logger.info(f"Resume harvest of {category} after {state['count']} records.")
+            except BadResumptionToken as e:
+                logger.warning(f'Unable to resume harvest of {category} ({e}), harvest from scratch.')
+                state = None
+        if state is None:
+            checkpoints.clear(category, from_date, until_date)
+            data = await asyncio.to_thread(self._list_records, category, from_date, until_date)
+        logger.info('Papers retrieved.')
+
+        members = [0]
+        if state is not None:
+            os.truncate(full_path, state['offset'])
+            entry = archive.get_entry(category, from_date, until_date) or {}
+            # the truncation point is a member boundary too, even if the manifest was not updated before the crash
+            members = [offset for offset in entry.get('members', [0]) if offset < state['offset']] or [0]
+            members.append(state['offset'])
+            if replay:
+                for raw_records in archive.iter_raw_batches(category, from_date, until_date):
+                    yield raw_records
+
+        count = state['count'] if state is not None else 0
+        compressor = ShardCompressor()
+        async with aiofiles.open(full_path, 'ab' if state is not None else 'wb') as f:
+            if data is not None:
+                async for batch in self._harvest_raw_records(data, category, from_date, until_date, count):
+                    page = batch[0][0]
+                    if page is not None:  # previous pages are complete, persist progress before writing the new one
+                        await f.write(compressor.end_member())
+                        await f.flush()
+                        offset = await f.tell()
+                        members.append(offset)
+                        checkpoints.save(category, from_date, until_date, page['token'], page['count'], offset)
+                        archive.record_shard(category, from_date, until_date, page['count'], members)
+                    raw_records = [raw for _, raw in batch]
+                    count += len(raw_records)
+                    await f.write(compressor.compress(raw_records))
+                    yield raw_records
+            await f.write(compressor.end_member())
+        await asyncio.to_thread(archive.record_shard, category, from_date, until_date, count, members, complete=True)
+        checkpoints.clear(category, from_date, until_date)
+
+    async def download_category_metadata(
+            self,
+            category,
+            from_date,
+            until_date,
+            data_path):
+        """Download metadata from arXiv for specific category and date range in batch.
+        Args:
+            category (str): Specify paper category like "cs", "math", etc.
+                Reference to category could be found in http://export.arxiv.org/oai2?verb=ListSets
+                Only accept one category at a time.
+            from_date (str): The start date for the date range in YYYY-MM-DD format.
+            until_date (str): The end date for the date range in YYYY-MM-DD format.
+        Returns:
+            Downloaded gzip shard with arxiv metadata, one record per line.
+        Note:
+            Function originated from jack-tol's [arXivGPT](https://github.com/jack-tol/arXivGPT/blob/main/metadata_pipeline.py).
+            With minor modification to: 1. specify paper category (the setSpec param); 2. save one record per line.
+            An interrupted download is resumed from its last checkpoint on re-run, a complete one is not downloaded again.
+        """
+        async for _ in self._archived_raw_records(category, from_date, until_date, data_path, replay=False):
+            pass
+        archive = HarvestArchive(data_path)
+        if not archive.get_entry(category, from_date, until_date)['record_count']:
+            logger.warning("No records found matching the criteria.")
+            return None
+        return archive.shard_path(category, from_date, until_date)
+
+    async def stream_category_metadata(
+            self,
+            category,
+            from_date,
+            until_date,
+            archive_path: Optional[str] = None,
+            batch_size: Optional[int] = None):
+        """Harvest metadata by category and yield parsed records as each OAI page arrives.
+        Args:
+            category (str): Specify paper category like "cs", "math", etc.
+                Only accept one category at a time.
+            from_date (str): The start date for the date range in YYYY-MM-DD format.
+            until_date (str): The end date for the date range in YYYY-MM-DD format.
+            archive_path (str): optional folder to archive raw xml (gzip shard, one record per line) as a side sink.
+                With archive, an interrupted harvest is resumed from its checkpoint on re-run,
+                and a window already complete in the archive is streamed from its shard instead of downloaded.
+            batch_size (int): if set, yield lists of up to batch_size records instead of single records.
+        Yields:
+            dict of paper metadata (or list of dicts if batch_size is set)
+        """
+        if archive_path is not None:
+            raw_records_batches = self._archived_raw_records(category, from_date, until_date, archive_path)
+        else:
+            raw_records_batches = self._streamed_raw_records(category, from_date, until_date)
+
+        batch = []
+        async for raw_records in raw_records_batches:
+            for cleaned_record in raw_records:
+                record_data = decode_oai_record(cleaned_record)
+                if record_data is None:
+                    continue
+                if batch_size is None:
+                    yield record_data
+                    continue
+                batch.append(record_data)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    async def _streamed_raw_records(self, category, from_date, until_date):
+        """harvest batches of raw records without archive (and without checkpoint)"""
+        logger.info('Getting papers...')
+        data = await asyncio.to_thread(self._list_records, category, from_date, until_date)
+        logger.info('Papers retrieved.')
+        if data is None:
+            return
+        async for batch in self._harvest_raw_records(data, category, from_date, until_date):
+            yield [raw for _, raw in batch]
+
+    async def retrieve_metadata_by_category(
+            self,
+            category,
+            from_date,
+            until_date,
+            data_path: Optional[str] = None,
+            archive: bool = True):
         """retrieve metadata by category through OAI protocol
         Args:
             category (str): Specify paper category like "cs", "math", etc. 
@@ -148,81 +429,35 @@ class ArxivKit:
                 Only accept one category at a time.
             from_date (str): The start date for the date range in YYYY-MM-DD format.
             until_date (str): The end date for the date range in YYYY-MM-DD format.
+            data_path (str): folder of the raw xml archive, default to self.data_path.
+            archive (bool): whether to keep the raw xml in the compressed archive alongside parsing.
         Returns:
-            str: full path of the downloaded metadata file
+            list of paper metadata dicts
         """
         data_path = self.data_path if data_path is None else data_path
-        full_path = await self.download_category_metadata(category, from_date, until_date, data_path)
-        if os.path.exists(full_path) and full_path.endswith('.xml') and os.path.getsize(full_path) > 0:
-            # define namespace
-            namespaces = {
-                'oai': 'http://www.openarchives.org/OAI/2.0/',
-                'arxiv': 'http://arxiv.org/OAI/arXiv/'
-            }
-
-            oai_metadata = []
-            # read xml file by line
-            with open(full_path, 'r', encoding='utf-8') as file:
-                for line in file:
-                    xml_info = ET.fromstring(line)
-                
-                    # target on record element
-                    if xml_info.tag == '{http://www.openarchives.org/OAI/2.0/}record':
-                        # get header info
-                        header = xml_info.find('oai:header', namespaces)
-                        identifier = header.find('oai:identifier', namespaces).text
-                        datestamp = header.find('oai:datestamp', namespaces).text
-                        setSpec = header.find('oai:setSpec', namespaces).text
-
-                        # get metadata
-                        metadata = xml_info.find('oai:metadata', namespaces)
-                        arxiv = metadata.find('arxiv:arXiv', namespaces)
-                        
-                        # get arXiv info
-                        arxiv_id = arxiv.find('arxiv:id', namespaces).text
-                        created = arxiv.find('arxiv:created', namespaces).text
-                        updated = arxiv.find('arxiv:updated', namespaces).text if arxiv.find('arxiv:updated', namespaces) is not None else None
-                        
-                        # get authors info
-                        authors = []
-                        for author in arxiv.findall('arxiv:authors/arxiv:author', namespaces):
-                            keyname = author.find('arxiv:keyname', namespaces).text
-                            forenames = author.find('arxiv:forenames', namespaces).text if author.find('arxiv:forenames', namespaces) is not None else ''
-                            suffix = author.find('arxiv:suffix', namespaces)
-                            suffix_text = suffix.text if suffix is not None else ''
-                            authors.append(f"{forenames} {keyname} {suffix_text}".strip())
-                        
-                        # get title, abstract, etc
-                        title = arxiv.find('arxiv:title', namespaces).text
-                        categories = arxiv.find('arxiv:categories', namespaces).text.split(' ')
-                        comments = arxiv.find('arxiv:comments', namespaces).text if arxiv.find('arxiv:comments', namespaces) is not None else None
-                        journal_ref = arxiv.find('arxiv:journal-ref', namespaces)
-                        journal_ref_text = journal_ref.text if journal_ref is not None else None
-                        doi = arxiv.find('arxiv:doi', namespaces)
-                        doi_text = doi.text if doi is not None else None
-                        license = arxiv.find('arxiv:license', namespaces).text
-                        abstract = arxiv.find('arxiv:abstract', namespaces).text
-
-                        # construct dict
-                        record_data = {
-                            "identifier": identifier,
-                            "datestamp": datestamp,
-                            "setSpec": setSpec,
-                            "arxiv_id": arxiv_id,
-                            "created": created,
-                            "updated": updated,
-                            "authors": authors,
-                            "title": title,
-                            "categories": categories,
-                            "comments": comments,
-                            "journal_ref": journal_ref_text,
-                            "doi": doi_text,
-                            "license": license,
-                            "abstract": abstract
-                        }
-                        oai_metadata.append(record_data)
-        else:
-            logger.error(f'Unexpected error: Failed to download metadata for category {category} from {from_date} to {until_date}.')
-            raise
+        archive_path = data_path if archive else None
+        oai_metadata = []
+        async for batch in self.stream_category_metadata(category, from_date, until_date, archive_path, batch_size=1000):
+            oai_metadata.extend(batch)
+        if not oai_metadata:
+            logger.warning(f'No records found for category {category} from {from_date} to {until_date}.')
+        return oai_metadata
+
+    def read_metadata_file(self, full_path, n_workers: Optional[int] = 1, member_offsets: Optional[List[int]] = None):
+        """parse an archived xml file (one record per line, plain or gzip shard) into list of paper metadata
+        Args:
+            full_path (str): path of the archived xml file
+            n_workers (int): number of processes to decode the file in parallel, None for cpu count.
+            member_offsets (list): start offsets of the gzip members of a shard, required to decode a shard in parallel.
+        Returns:
+            list of paper metadata dicts, in file order
+        """
+        return decode_oai_file(full_path, n_workers=n_workers, member_offsets=member_offsets)
 
-        return oai_metadata
\ No newline at end of file
+    def read_archived_metadata(self, category, from_date, until_date, n_workers: Optional[int] = 1, data_path: Optional[str] = None):
+        """parse an archived harvest window into list of paper metadata, None if the window is not complete in the archive"""
+        archive = HarvestArchive(self.data_path if data_path is None else data_path)
+        if not archive.is_complete(category, from_date, until_date, verify=False):
+            return None
+        entry = archive.get_entry(category, from_date, until_date)
+        return self.read_metadata_file(archive.shard_path(category, from_date, until_date), n_workers, entry['members'])
@@ -0,0 +1,126 @@
+import os
+import gzip
+import zlib
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from tools.oai_checkpoint import read_json_file, update_json_file, window_key
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ShardCompressor:
+    def __init__(self, compresslevel: int = 6):
+        """Compress raw records into a gzip shard, one gzip member per OAI page.
+        Concatenated gzip members form a valid gzip file, so a shard could be truncated at any member
+        boundary (e.g. back to a harvest checkpoint) and members could be decoded independently.
+        """
+        self.compresslevel = compresslevel
+        self._compressor = None
+
+    def compress(self, raw_records: List[str]) -> bytes:
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        return self._compressor.compress(('\n'.join(raw_records) + '\n').encode('utf-8'))
+
+    def end_member(self) -> bytes:
+        """finish current gzip member, next compress starts a new one"""
+        if self._compressor is None:
+            return b''
+        data = self._compressor.flush()
+        self._compressor = None
+        return data
+
+
+class HarvestArchive:
+    def __init__(self, archive_path):
+        """Compressed raw harvest archive, one gzip shard per (set, from, until) window, with a manifest.
+        Args:
+            archive_path (str): root folder of the archive, shards are stored as `{set}/{from}_{until}.xml.gz`.
+        Note:
+            The manifest (`oai_manifest.json`) records for each shard its record count, member offsets,
+            size, sha256 checksum and whether the harvest window is complete. Complete shards are reused
+            instead of downloaded again.
+            A window ending today or later is never complete, records may still be published in it.
+        """
+        self.archive_path = archive_path
+        self.manifest_path = os.path.join(archive_path, 'oai_manifest.json')
+
+    _key = staticmethod(window_key)
+
+    def shard_path(self, category, from_date, until_date) -> str:
+        return os.path.join(self.archive_path, category, f"{from_date}_{until_date}.xml.gz")
+
+    def _read_manifest(self) -> Dict:
+        return read_json_file(self.manifest_path)
+
+    def get_entry(self, category, from_date, until_date) -> Optional[Dict]:
+        return self._read_manifest().get(self._key(category, from_date, until_date))
+
+    def record_shard(self, category, from_date, until_date, record_count, members, complete=False):
+        """update manifest entry of a shard, checksum is computed once the shard is complete
+        (hashes the whole shard then, run it off the event loop). Safe to call from concurrent harvests:
+        the shard is hashed outside of the manifest lock, only the read-modify-write of the manifest holds it.
+        """
+        complete = complete and is_closed_window(until_date)
+        full_path = self.shard_path(category, from_date, until_date)
+        entry = {
+            'path': os.path.relpath(full_path, self.archive_path),
+            'record_count': record_count,
+            'members': members,
+            'size': os.path.getsize(full_path) if os.path.exists(full_path) else 0,
+            'sha256': file_sha256(full_path) if complete else None,
+            'complete': complete,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        key = self._key(category, from_date, until_date)
+        update_json_file(self.manifest_path, lambda manifest: manifest.update({key: entry}))
+        return entry
+
+    def is_complete(self, category, from_date, until_date, verify: bool = True) -> bool:
+        """whether the window is fully archived, and (if verify) its shard still matches the manifest
+        (verify hashes the whole shard, run it off the event loop)
+        """
+        entry = self.get_entry(category, from_date, until_date)
+        if not entry or not entry.get('complete') or not is_closed_window(until_date):
+            return False
+        full_path = self.shard_path(category, from_date, until_date)
+        if not os.path.exists(full_path) or os.path.getsize(full_path) != entry['size']:
+            logger.warning(f"Archive shard {full_path} is missing or changed, it will be harvested again.")
+            return False
+        if verify and file_sha256(full_path) != entry['sha256']:
+            logger.warning(f"Archive shard {full_path} fails its checksum, it will be harvested again.")
+            return False
+        return True
+
+    def iter_raw_batches(self, category, from_date, until_date, batch_size: int = 1000) -> Iterator[List[str]]:
+        """stream raw records out of a shard in batches, without decompressing it as a whole"""
+        batch = []
+        with gzip.open(self.shard_path(category, from_date, until_date), 'rt', encoding='utf-8') as file:
+            for line in file:
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                batch.append(line)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def is_closed_window(until_date) -> bool:
+    """whether a harvest window ending on until_date (YYYY-MM-DD) is over, so no record could still be stamped in it
+    (the day must be over both locally and in UTC, the time zone of OAI datestamps)
+    """
+    today = min(datetime.now().strftime('%Y-%m-%d'), datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+    return str(until_date)[:10] < today
+
+def file_sha256(full_path, chunk_size: int = 1024 * 1024) -> str:
+    sha = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
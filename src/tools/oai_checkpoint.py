@@ -0,0 +1,97 @@
+import os
+import json
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def window_key(category, from_date, until_date) -> str:
+    """key of a harvest window in the checkpoint store and the archive manifest"""
+    return f"{category}|{from_date}|{until_date}"
+
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+def json_file_lock(path) -> threading.Lock:
+    """lock shared by all writers of a json state file in this process
+    (e.g. concurrent domain harvests updating the one archive manifest)"""
+    key = os.path.abspath(path)
+    with _file_locks_lock:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = threading.Lock()
+        return lock
+
+def read_json_file(path) -> Dict:
+    """content of a small json state file, empty if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unable to read {path}: {e}")
+        return {}
+
+def write_json_file(path, content: Dict):
+    """write a small json state file through a temporary file and an atomic swap, never leaving it half-written"""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def update_json_file(path, update: Callable[[Dict], Optional[bool]]):
+    """read-modify-write a json state file under its lock, so concurrent updates never drop each other's entries
+    Args:
+        update: changes the content in place, returning False leaves the file untouched
+    """
+    with json_file_lock(path):
+        content = read_json_file(path)
+        if update(content) is not False:
+            write_json_file(path, content)
+
+
+class HarvestCheckpoint:
+    def __init__(self, path):
+        """Persist OAI harvest progress per (set, from, until) in a small json file.
+        Args:
+            path (str): full path of the checkpoint json file.
+        Note:
+            Each entry keeps the resumptionToken that fetches the next unprocessed page,
+            the count of records already harvested, and the byte offset of the archive file
+            at that page boundary, so that a re-run could truncate the archive and resume without duplicates.
+        """
+        self.path = path
+
+    _key = staticmethod(window_key)
+
+    def _read_all(self) -> Dict:
+        return read_json_file(self.path)
+
+    def load(self, category, from_date, until_date) -> Optional[Dict]:
+        """get checkpoint of a harvest, return None if there is nothing to resume"""
+        return self._read_all().get(self._key(category, from_date, until_date))
+
+    def save(self, category, from_date, until_date, token, count, offset):
+        """record progress of a harvest at a page boundary"""
+        update_json_file(self.path, lambda checkpoints: checkpoints.update({
+            self._key(category, from_date, until_date): {
+                'token': token,
+                'count': count,
+                'offset': offset
+            }}))
+
+    def clear(self, category, from_date, until_date):
+        """drop checkpoint once a harvest completes (or could no longer be resumed)"""
+        key = self._key(category, from_date, until_date)
+        update_json_file(self.path, lambda checkpoints: checkpoints.pop(key, None) is not None)
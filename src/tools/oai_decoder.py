@@ -0,0 +1,243 @@
+import os
+import gzip
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+OAI_NAMESPACES = {
+    'oai': 'http://www.openarchives.org/OAI/2.0/',
+    'arxiv': 'http://arxiv.org/OAI/arXiv/'
+}
+
+def parse_oai_record(line):
+    """parse one-line raw xml of an OAI record into paper metadata dict
+    Reference implementation with namespaced find() calls, kept to verify and benchmark decode_oai_record.
+    Args:
+        line (str): raw xml of one OAI record in arXiv metadata format
+    Returns:
+        dict of paper metadata, or None if the element is not a record
+    """
+    namespaces = OAI_NAMESPACES
+    xml_info = ET.fromstring(line)
+
+    # target on record element
+    if xml_info.tag != '{http://www.openarchives.org/OAI/2.0/}record':
+        return None
+
+    # get header info
+    header = xml_info.find('oai:header', namespaces)
+    identifier = header.find('oai:identifier', namespaces).text
+    datestamp = header.find('oai:datestamp', namespaces).text
+    setSpec = header.find('oai:setSpec', namespaces).text
+
+    # get metadata
+    metadata = xml_info.find('oai:metadata', namespaces)
+    arxiv = metadata.find('arxiv:arXiv', namespaces)
+
+    # get arXiv info
+    arxiv_id = arxiv.find('arxiv:id', namespaces).text
+    created = arxiv.find('arxiv:created', namespaces).text
+    updated = arxiv.find('arxiv:updated', namespaces).text if arxiv.find('arxiv:updated', namespaces) is not None else None
+
+    # get authors info
+    authors = []
+    for author in arxiv.findall('arxiv:authors/arxiv:author', namespaces):
+        keyname = author.find('arxiv:keyname', namespaces).text
+        forenames = author.find('arxiv:forenames', namespaces).text if author.find('arxiv:forenames', namespaces) is not None else ''
+        suffix = author.find('arxiv:suffix', namespaces)
+        suffix_text = suffix.text if suffix is not None else ''
+        authors.append(f"{forenames} {keyname} {suffix_text}".strip())
+
+    # get title, abstract, etc
+    title = arxiv.find('arxiv:title', namespaces).text
+    categories = arxiv.find('arxiv:categories', namespaces).text.split(' ')
+    comments = arxiv.find('arxiv:comments', namespaces).text if arxiv.find('arxiv:comments', namespaces) is not None else None
+    journal_ref = arxiv.find('arxiv:journal-ref', namespaces)
+    journal_ref_text = journal_ref.text if journal_ref is not None else None
+    doi = arxiv.find('arxiv:doi', namespaces)
+    doi_text = doi.text if doi is not None else None
+    license = arxiv.find('arxiv:license', namespaces).text
+    abstract = arxiv.find('arxiv:abstract', namespaces).text
+
+    # construct dict
+    return {
+        "identifier": identifier,
+        "datestamp": datestamp,
+        "setSpec": setSpec,
+        "arxiv_id": arxiv_id,
+        "created": created,
+        "updated": updated,
+        "authors": authors,
+        "title": title,
+        "categories": categories,
+        "comments": comments,
+        "journal_ref": journal_ref_text,
+        "doi": doi_text,
+        "license": license,
+        "abstract": abstract
+    }
+
+
+_OAI = '{http://www.openarchives.org/OAI/2.0/}'
+_ARXIV = '{http://arxiv.org/OAI/arXiv/}'
+_RECORD_TAG = _OAI + 'record'
+_AUTHOR_TAG = _ARXIV + 'author'
+_AUTHOR_PART_TAGS = {_ARXIV + 'keyname': 0, _ARXIV + 'forenames': 1, _ARXIV + 'suffix': 2}
+_FIELD_TAGS = {
+    _OAI + 'identifier': 'identifier',
+    _OAI + 'datestamp': 'datestamp',
+    _OAI + 'setSpec': 'setSpec',
+    _ARXIV + 'id': 'arxiv_id',
+    _ARXIV + 'created': 'created',
+    _ARXIV + 'updated': 'updated',
+    _ARXIV + 'title': 'title',
+    _ARXIV + 'categories': 'categories',
+    _ARXIV + 'comments': 'comments',
+    _ARXIV + 'journal-ref': 'journal_ref',
+    _ARXIV + 'doi': 'doi',
+    _ARXIV + 'license': 'license',
+    _ARXIV + 'abstract': 'abstract',
+}
+_RECORD_FIELDS = ("identifier", "datestamp", "setSpec", "arxiv_id", "created", "updated", "authors",
+                  "title", "categories", "comments", "journal_ref", "doi", "license", "abstract")
+
+def decode_oai_record(line) -> Optional[Dict]:
+    """decode one-line raw xml of an OAI record into paper metadata dict in a single pass
+    Args:
+        line (str): raw xml of one OAI record in arXiv metadata format
+    Returns:
+        dict of paper metadata (same as parse_oai_record), or None if the element is not a record
+    Note:
+        Walks the element tree once and dispatches on precomputed namespaced tags,
+        instead of one find() per field (twice for optional ones).
+    """
+    root = ET.fromstring(line)
+    if root.tag != _RECORD_TAG:
+        return None
+
+    record_data = dict.fromkeys(_RECORD_FIELDS)
+    authors = []
+    author = None
+    field_tags = _FIELD_TAGS
+    author_part_tags = _AUTHOR_PART_TAGS
+    for elem in root.iter():
+        tag = elem.tag
+        field = field_tags.get(tag)
+        if field is not None:
+            if record_data[field] is None:  # keep the first one, e.g. of several setSpec
+                record_data[field] = elem.text
+        elif tag == _AUTHOR_TAG:
+            author = ['', '', '']  # keyname, forenames, suffix
+            authors.append(author)
+        elif author is not None:
+            part = author_part_tags.get(tag)
+            if part is not None:
+                author[part] = elem.text
+
+    record_data["authors"] = [f"{forenames} {keyname} {suffix}".strip() for keyname, forenames, suffix in authors]
+    if record_data["categories"] is not None:
+        record_data["categories"] = record_data["categories"].split(' ')
+    return record_data
+
+
+def split_file_ranges(full_path, n_shards) -> List[Tuple[int, int]]:
+    """split a file into n_shards byte ranges of about equal size
+    Boundaries need not fall on line breaks, decode_oai_file_range aligns them.
+    """
+    size = os.path.getsize(full_path)
+    n_shards = max(1, min(n_shards, size))
+    step = size // n_shards
+    bounds = [i * step for i in range(n_shards)] + [size]
+    return [(bounds[i], bounds[i + 1]) for i in range(n_shards)]
+
+def decode_oai_file_range(full_path, start, end) -> List[Dict]:
+    """decode records of a harvest file (one record per line) whose line starts within [start, end)
+    Args:
+        full_path (str): path of harvest file
+        start (int): start byte offset
+        end (int): end byte offset (exclusive)
+    Returns:
+        list of paper metadata dicts, in file order
+    """
+    oai_metadata = []
+    with open(full_path, 'rb') as file:
+        if start > 0:
+            file.seek(start - 1)
+            file.readline()  # move to the first line starting at or after start
+        pos = file.tell()
+        while pos < end:
+            line = file.readline()
+            if not line:
+                break
+            pos += len(line)
+            if not line.strip():
+                continue
+            record_data = decode_oai_record(line)
+            if record_data is not None:
+                oai_metadata.append(record_data)
+    return oai_metadata
+
+def decode_oai_gzip_range(full_path, start, end) -> List[Dict]:
+    """decode records of a gzip shard between two gzip member boundaries [start, end)"""
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        data = gzip.decompress(file.read(end - start))  # handles several concatenated members
+    oai_metadata = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        record_data = decode_oai_record(line)
+        if record_data is not None:
+            oai_metadata.append(record_data)
+    return oai_metadata
+
+def _decode_oai_gzip(full_path) -> List[Dict]:
+    oai_metadata = []
+    with gzip.open(full_path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record_data = decode_oai_record(line)
+            if record_data is not None:
+                oai_metadata.append(record_data)
+    return oai_metadata
+
+def decode_oai_file(
+        full_path,
+        n_workers: Optional[int] = None,
+        min_shard_bytes: int = 8 * 1024 * 1024,
+        member_offsets: Optional[List[int]] = None) -> List[Dict]:
+    """decode a harvest file (one record per line), sharded by byte ranges across a process pool
+    Args:
+        full_path (str): path of harvest file, plain text or gzip shard (`.gz`)
+        n_workers (int): number of worker processes, default to cpu count. 1 to decode in current process.
+        min_shard_bytes (int): do not split the file into shards smaller than this
+        member_offsets (list): start offsets of gzip members, a gzip shard could only be split at these offsets
+    Returns:
+        list of paper metadata dicts, in file order
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    size = os.path.getsize(full_path)
+    n_shards = min(n_workers * 4, size // min_shard_bytes)  # a few shards per worker to even out the load
+    is_gzip = full_path.endswith('.gz')
+    if is_gzip:
+        if not member_offsets or n_workers == 1 or n_shards <= 1:
+            return _decode_oai_gzip(full_path)
+        step = max(1, len(member_offsets) // n_shards)
+        bounds = sorted(set(member_offsets[::step]) | {0}) + [size]
+        ranges = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1]]
+        decode_range = decode_oai_gzip_range
+    else:
+        if n_workers == 1 or n_shards <= 1:
+            return decode_oai_file_range(full_path, 0, size)
+        ranges = split_file_ranges(full_path, n_shards)
+        decode_range = decode_oai_file_range
+
+    oai_metadata = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for shard_metadata in executor.map(decode_range,
+                                           [full_path] * len(ranges),
+                                           [start for start, _ in ranges],
+                                           [end for _, end in ranges]):
+            oai_metadata.extend(shard_metadata)
+    return oai_metadata
@@ -0,0 +1,186 @@
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def parse_retry_after(value, default: float = 30) -> float:
+    """parse Retry-After header, which could be either seconds or an HTTP date"""
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_dt = parsedate_to_datetime(value)
+        return max((retry_dt - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+class RateGovernor:
+    def __init__(self, min_interval: float = 3.0):
+        """Space out requests to one host, shared by threads and coroutines alike.
+        Args:
+            min_interval (float): politeness interval in seconds between two requests.
+        Note:
+            Each request reserves the next free slot, so concurrent harvests queue up behind each other
+            instead of bursting. A Retry-After from the server defers every pending slot of the host.
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+
+    def _reserve(self) -> float:
+        """reserve next request slot, return seconds to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._blocked_until)
+            self._next_slot = slot + self.min_interval
+            return slot - now
+
+    def _is_blocked(self) -> bool:
+        with self._lock:
+            return time.monotonic() < self._blocked_until
+
+    def wait(self):
+        """block current thread until a request is allowed"""
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                time.sleep(delay)
+            if not self._is_blocked():  # re-queue if a Retry-After came in meanwhile
+                return
+
+    async def acquire(self):
+        """wait without blocking the event loop until a request is allowed"""
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not self._is_blocked():
+                return
+
+    def defer(self, seconds: float):
+        """hold back all requests to the host, e.g. on 503 / 429 with Retry-After"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Server asked to retry later, requests on hold for {seconds:.0f} seconds.")
+
+
+
+class TokenBucketLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None, min_factor: float = 0.05):
+        """Keep requests to a quota-limited API within requests and tokens per minute, adapting to 429s.
+        Args:
+            requests_per_minute (float): request quota per minute.
+            tokens_per_minute (float): token quota per minute, None if the API has none.
+            min_factor (float): lowest fraction of the quota the limiter slows down to.
+        Note:
+            Both buckets start full and refill continuously at factor * quota / 60 per second.
+            A 429 halves the factor, empties the buckets and holds requests back for Retry-After, or for an
+            exponential backoff without it. Every success raises the factor back by a tenth of the quota,
+            so the rate settles just under what the provider actually grants.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_factor = min_factor
+        self.factor = 1.0
+        self._lock = threading.Lock()
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._strikes = 0  # 429s in a row
+
+    def _refill(self, now: float):
+        elapsed, self._updated = now - self._updated, now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60 * self.factor)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60 * self.factor)
+
+    def _reserve(self, tokens: int) -> float:
+        """take one request and tokens from the buckets if available, else return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.tokens_per_minute:
+                tokens = min(tokens, self.tokens_per_minute)  # an oversized request waits for a full bucket only
+            else:
+                tokens = 0
+            missing_requests = max(0.0, 1 - self._requests)
+            missing_tokens = max(0.0, tokens - self._tokens)
+            if missing_requests == 0 and missing_tokens == 0:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            delay = missing_requests / (self.requests_per_minute / 60 * self.factor)
+            if missing_tokens:
+                delay = max(delay, missing_tokens / (self.tokens_per_minute / 60 * self.factor))
+            return delay
+
+    def wait(self, tokens: int = 0):
+        """block current thread until a request of given tokens is allowed"""
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def acquire(self, tokens: int = 0):
+        """wait without blocking the event loop until a request of given tokens is allowed"""
+        while True:
+            delay = self._reserve(tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        with self._lock:
+            self.factor = min(1.0, self.factor + 0.1)
+            self._strikes = 0
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """slow down after a 429, and hold back all requests for retry_after seconds or an exponential backoff"""
+        with self._lock:
+            self._strikes += 1
+            hold = retry_after if retry_after is not None else min(60.0, 2.0 ** self._strikes)
+            self.factor = max(self.min_factor, self.factor / 2)
+            self._requests, self._tokens = 0.0, 0.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + hold)
+        logger.warning(f"Rate limited, slowed down to {self.factor:.0%} of quota and on hold for {hold:.0f} seconds.")
+
+_governors: Dict[str, RateGovernor] = {}
+_governors_lock = threading.Lock()
+
+def get_host_governor(host: str, min_interval: Optional[float] = None) -> RateGovernor:
+    """get the rate governor shared by all clients of a host"""
+    with _governors_lock:
+        governor = _governors.get(host)
+        if governor is None:
+            governor = RateGovernor(min_interval if min_interval is not None else 3.0)
+            _governors[host] = governor
+        elif min_interval is not None:
+            governor.min_interval = max(governor.min_interval, min_interval)
+        return governor
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+
+def get_quota_limiter(key: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None) -> TokenBucketLimiter:
+    """get the quota limiter shared by all callers of an API (e.g. one per embedding model)"""
+    with _governors_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute)
+            _limiters[key] = limiter
+        return limiter